@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import argparse
+import logging
+import multiprocessing
+import sys
+import _functions.log_config as lc
+import _functions.metrics as mt
+import _functions.pipeline as pl
+import _functions.unlock_file as uf
+import _functions.watch_folder as wf
+import _functions.work_queue as wq
+
+"""
+    Command line entry point of the PDF unlock tool. Runs the same steps as the gui (unzip, rename, find, unlock, count)
+    without tkinter, so it can be used on servers without a display and from other scripts:
+
+        python PDF_unlock_cli.py <folder or zip file> [--out <output directory>] [--workers <n>]
+                                 [--stream [--non-pdf copy]] [--archive <zip or tar file>]
+        python PDF_unlock_cli.py <inbox folder> --watch [--out <output directory>]
+        python PDF_unlock_cli.py <folder or zip file on a share> --publish [--queue <queue file>]
+        python PDF_unlock_cli.py <queue file> --work [--workers <n>]        (on any number of machines)
+
+    From python use _functions.pipeline.unlock_tree.
+"""
+
+
+def parse_args(argv=None):
+    """
+    Parses the command line arguments.
+
+    Parameters
+    ----------
+    argv: list
+        The arguments, default is sys.argv[1:]
+    """
+
+    parser = argparse.ArgumentParser(description='Unlocks protected pdf files in a folder or zipped folder.')
+    parser.add_argument('src', help='folder or zip file with pdf files')
+    parser.add_argument('-o', '--out', default=None,
+                        help='output directory, default is the folder name followed by _unlocked')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='number of worker processes, default is the number of cpu\'s')
+    parser.add_argument('--stream', action='store_true',
+                        help='unlock the pdf files of a zip file without unzipping it to disk first')
+    parser.add_argument('--non-pdf', choices=['skip', 'copy'], default='skip',
+                        help='with --stream, skip or copy the files that are not pdf files (default skip)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only unlock pdf files that are new or changed since the previous run')
+    parser.add_argument('--hash', action='store_true',
+                        help='with --incremental, compare the content of files with a changed modification time')
+    parser.add_argument('--prune', action='store_true',
+                        help='with --incremental, remove unlocked files whose source no longer exists')
+    parser.add_argument('--no-fast-path', action='store_true',
+                        help='resave every pdf file, also the ones without protection or metadata')
+    parser.add_argument('--profile', choices=sorted(uf.SAVE_PROFILES), default=uf.DEFAULT_PROFILE,
+                        help='save profile of the resaved pdf files: fast (default), compact (object streams, '
+                             'recompressed streams, no unused resources), web (linearized) or compact-web')
+    parser.add_argument('--dedup', action='store_true',
+                        help='unlock pdf files with the same content once and link or copy the result')
+    parser.add_argument('--max-inflight-mb', type=int, default=uf.MAX_IN_FLIGHT_BYTES // (1024 * 1024),
+                        help='maximum total size in MB of the large pdf files (from ' +
+                             str(uf.LARGE_FILE_SIZE // (1024 * 1024)) + ' MB) unlocked at the same time')
+    parser.add_argument('--read-ahead-mb', type=int, default=0,
+                        help='read the next pdf files into memory (up to this many MB) while the workers unlock, '
+                             'for folders on a slow network share (default 0, off)')
+    parser.add_argument('--scratch', default=None,
+                        help='local folder the workers save in, the unlocked files are moved to the output '
+                             'directory in the background')
+    parser.add_argument('--timeout', type=float, default=0,
+                        help='seconds a worker process may work on one pdf file before it is killed and the file '
+                             'is quarantined (default 0, no limit)')
+    parser.add_argument('--max-rss-mb', type=int, default=0,
+                        help='memory in MB a worker process may use before it is killed and its file is '
+                             'quarantined (default 0, no limit)')
+    parser.add_argument('--resume', action='store_true',
+                        help='skip the files unzipped and unlocked by a previous run that was stopped or crashed')
+    parser.add_argument('--archive', default=None,
+                        help='write the unlocked files into this zip or tar file (.zip, .tar, .tar.gz) instead of '
+                             'the output directory')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep running and unlock every zip file, folder or pdf file dropped in the src folder')
+    parser.add_argument('--settle', type=float, default=wf.SETTLE_SECONDS,
+                        help='with --watch, seconds a dropped item may not change before it is unlocked')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='with --watch, maximum number of dropped items unlocked in one batch (default ' +
+                             str(wf.BATCH_SIZE) + '), with --publish, number of pdf files a worker claims at once '
+                             '(default ' + str(wq.BATCH_SIZE) + ')')
+    parser.add_argument('--publish', action='store_true',
+                        help='prepare the src folder or zip file and publish its pdf files in a work queue for --work')
+    parser.add_argument('--queue', default=None,
+                        help='with --publish, the queue file, default is the output directory followed by '
+                             '_queue.sqlite')
+    parser.add_argument('--work', action='store_true',
+                        help='src is a queue file: unlock its batches until the queue is done, several workers '
+                             'on several machines can share one queue')
+    parser.add_argument('--lease', type=float, default=wq.LEASE_SECONDS,
+                        help='with --work, seconds a claimed batch stays with a worker that stopped responding')
+    parser.add_argument('--metrics', default=None,
+                        help='json lines file the timings and sizes of every file and step are written to')
+    parser.add_argument('--prometheus', default=None,
+                        help='Prometheus textfile (.prom) the totals per step are written to')
+    parser.add_argument('--slowest', type=int, default=0,
+                        help='print the given number of slowest files')
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='log level, DEBUG logs every step of every file (default INFO)')
+    parser.add_argument('--log-file', default=lc.LOG_FILE,
+                        help='log file, default ' + lc.LOG_FILE)
+    parser.add_argument('--log-max-mb', type=int, default=lc.MAX_BYTES // (1024 * 1024),
+                        help='size in MB at which the log file is rotated, 0 never rotates')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Runs the tool from the command line and prints a summary.
+
+    Parameters
+    ----------
+    argv: list
+        The arguments, default is sys.argv[1:]
+
+    Returns
+    -------
+    exit_code: int
+        0 if all pdf files were unlocked, 1 otherwise
+    """
+
+    args = parse_args(argv)
+    lc.setup_logging(args.log_level, filename=args.log_file, max_bytes=args.log_max_mb * 1024 * 1024)
+    logging.info('Starting Tool')
+    exporters = [mt.JsonLinesExporter(args.metrics)] if args.metrics else []
+    collector = mt.MetricsCollector(exporters, slowest_n=args.slowest)
+    if args.watch:
+        return watch(args, collector, exporters)
+    if args.publish or args.work:
+        return work_queue(args, collector, exporters)
+    summary = pl.unlock_tree(args.src, args.out, workers=args.workers, stream=args.stream,
+                             non_pdf=args.non_pdf, incremental=args.incremental, use_hash=args.hash,
+                             prune=args.prune, dedup=args.dedup,
+                             fast_path=not args.no_fast_path, on_metrics=collector, resume=args.resume,
+                             max_bytes=args.max_inflight_mb * 1024 * 1024, archive=args.archive,
+                             profile=args.profile, read_ahead=args.read_ahead_mb * 1024 * 1024,
+                             scratch_dir=args.scratch, **limits(args))
+    logging.info('Ready with tool')
+    lc.stop_logging()
+    for exporter in exporters:
+        exporter.close()
+    if args.prometheus:
+        mt.write_prometheus_textfile(args.prometheus, collector)
+
+    print('Number of pdf\'s found: ' + str(summary['pdf_files']))
+    print('Number of unlocked files: ' + str(summary['unlocked_pdfs']))
+    if args.archive:
+        print('Unlocked pdf files are in archive: ' + summary['out_dir'])
+    else:
+        print('Unlocked pdf files are in folder: ' + summary['out_dir'])
+    for category, number in sorted(summary['categories'].items()):
+        print('  ' + category + ': ' + str(number))
+    if summary['bytes_in']:
+        print('Size in: {:.1f} MB, out: {:.1f} MB ({:+.1f}%, profile {})'.format(
+            summary['bytes_in'] / 1e6, summary['bytes_out'] / 1e6,
+            100 * (summary['bytes_out'] - summary['bytes_in']) / summary['bytes_in'], args.profile))
+    if summary.get('resumed'):
+        print('Unlocked by the previous run (skipped): ' + str(summary['resumed']))
+    if 'cache_hits' in summary:
+        print('Up to date (skipped): ' + str(summary['cache_hits']) + ', new or changed: ' +
+              str(summary['cache_misses']))
+    if 'duplicates' in summary:
+        print('Duplicates: ' + str(summary['duplicates']) + ', saved ' +
+              '{:.1f} MB and {:.1f} s'.format(summary['dedup_bytes_saved'] / 1e6, summary['dedup_seconds_saved']))
+    if args.slowest:
+        print('Slowest files:')
+        for record in collector.slowest():
+            print('  {:.2f} s  {}'.format(record['seconds'], record['file']))
+    if summary.get('pruned'):
+        print('Removed unlocked files of deleted pdf\'s: ' + str(len(summary['pruned'])))
+    print_failed(summary)
+    return 1 if summary['failed'] else 0
+
+
+def limits(args):
+    """
+    Returns the limits of the worker processes (see _functions.watchdog) as keyword arguments, without the limits
+    that are off.
+    """
+
+    options = {}
+    if args.timeout:
+        options['timeout'] = args.timeout
+    if args.max_rss_mb:
+        options['max_rss'] = args.max_rss_mb * 1024 * 1024
+    return options
+
+
+def print_failed(summary, flush=False):
+    """
+    Prints the quarantined files with the reason and the other files that failed.
+    """
+
+    quarantined = dict(summary.get('quarantined', []))
+    for file, reason in quarantined.items():
+        print('Quarantined (' + reason + '): ' + file, file=sys.stderr, flush=flush)
+    for file in summary['failed']:
+        if file not in quarantined:
+            print('Failed to unlock: ' + file, file=sys.stderr, flush=flush)
+
+
+def watch(args, collector, exporters):
+    """
+    Runs the tool in watch mode until it is interrupted (Ctrl+C) and prints a line for every unlocked item.
+    """
+
+    def on_summary(summary):
+        print('Unlocked ' + str(summary['unlocked_pdfs']) + ' of ' + str(summary['pdf_files']) +
+              ' pdf files into: ' + summary['out_dir'], flush=True)
+        print_failed(summary, flush=True)
+
+    try:
+        wf.watch(args.src, args.out, workers=args.workers, batch_size=args.batch_size or wf.BATCH_SIZE,
+                 settle_seconds=args.settle,
+                 on_summary=on_summary, non_pdf=args.non_pdf, dedup=args.dedup, fast_path=not args.no_fast_path,
+                 profile=args.profile, on_metrics=collector, max_bytes=args.max_inflight_mb * 1024 * 1024,
+                 **limits(args))
+    except KeyboardInterrupt:
+        pass
+    logging.info('Ready with tool')
+    lc.stop_logging()
+    for exporter in exporters:
+        exporter.close()
+    if args.prometheus:
+        mt.write_prometheus_textfile(args.prometheus, collector)
+    return 0
+
+
+def work_queue(args, collector, exporters):
+    """
+    Publishes a folder in a work queue (--publish) or runs a worker on a work queue (--work) and prints a summary.
+    """
+
+    if args.publish:
+        summary = pl.publish_tree(args.src, args.out, queue=args.queue, batch_size=args.batch_size or wq.BATCH_SIZE,
+                                  on_metrics=collector)
+    else:
+        summary = wq.work(args.src, workers=args.workers, lease_seconds=args.lease, on_metrics=collector,
+                          fast_path=not args.no_fast_path, profile=args.profile,
+                          max_bytes=args.max_inflight_mb * 1024 * 1024, **limits(args))
+    logging.info('Ready with tool')
+    lc.stop_logging()
+    for exporter in exporters:
+        exporter.close()
+    if args.prometheus:
+        mt.write_prometheus_textfile(args.prometheus, collector)
+
+    if args.publish:
+        print('Number of pdf\'s found: ' + str(summary['pdf_files']))
+        print('Published ' + str(summary['batches']) + ' batches in queue: ' + summary['queue'])
+        print('Unlocked pdf files will be in folder: ' + summary['out_dir'])
+        return 0
+    print('Unlocked by this worker: ' + str(summary['unlocked_pdfs']) + ' of ' + str(summary['pdf_files']) +
+          ' pdf files in ' + str(summary['batches']) + ' batches')
+    print('Unlocked pdf files are in folder: ' + summary['out_dir'])
+    print('Queue: ' + ', '.join(state + ': ' + str(number)
+                                for state, number in sorted(summary['status']['files'].items())) + ' pdf files')
+    for file in summary['failed']:
+        print('Failed to unlock: ' + file, file=sys.stderr)
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import logging
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+
+"""
+    This file is called from the file _functions.pipeline.py. It writes the unlocked files into a single zip or tar
+    file instead of a folder. Every unlocked file is saved in a local staging folder by the worker processes,
+    appended to the archive and removed again, so the archive is written once from start to end (also to a slow
+    network share) and the staging folder never holds more than the files in progress.
+"""
+
+
+ZIP = 'zip'
+TAR = 'tar'
+TAR_GZ = 'tar.gz'
+
+# Files are copied into the archive in chunks of this size
+CHUNK_SIZE = 1024 * 1024
+
+
+def archive_format(path):
+    """
+    Returns the format of an archive by its extension: ZIP (.zip), TAR (.tar) or TAR_GZ (.tar.gz or .tgz).
+    """
+
+    name = path.lower()
+    if name.endswith('.zip'):
+        return ZIP
+    if name.endswith('.tar'):
+        return TAR
+    if name.endswith('.tar.gz') or name.endswith('.tgz'):
+        return TAR_GZ
+    raise ValueError(f'Unknown archive format (use .zip, .tar, .tar.gz or .tgz): {path}')
+
+
+class _SequentialFile:
+    """
+    A file that can only be written from start to end. zipfile then writes the sizes after every member (data
+    descriptors) instead of seeking back to the member header.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.position = 0
+
+    def write(self, data):
+        self.position += len(data)
+        return self.file.write(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ArchiveWriter:
+    """
+    Writes files and empty directories into a zip or tar file as a stream. Can be used as a context manager.
+
+    Attributes
+    ----------
+    path: str
+        The archive
+    staging_dir: str
+        The local folder the unlocked files are saved in before they are added, the names in the archive are the
+        paths relative to this folder
+    files: int
+        The number of files added
+    """
+
+    def __init__(self, path, staging_dir=None, compress=False):
+        """
+        Parameters
+        ----------
+        path: str
+            The archive, the format follows from the extension (see archive_format)
+        staging_dir: str
+            The staging folder, default is a new temporary folder (removed by close)
+        compress: bool
+            Compress the files in a zip file, pdf files are mostly compressed already so the default is to store
+        """
+
+        self.path = os.path.abspath(path)
+        self.format = archive_format(path)
+        self.own_staging = staging_dir is None
+        self.staging_dir = staging_dir or tempfile.mkdtemp(prefix='pdf_unlock_')
+        self.files = 0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if self.format == ZIP:
+            self.output = _SequentialFile(open(self.path, 'wb'))
+            self.archive = zipfile.ZipFile(self.output, 'w',
+                                           zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED)
+        else:
+            self.output = None
+            self.archive = tarfile.open(self.path, 'w|gz' if self.format == TAR_GZ else 'w|')
+        logging.info(f'Writing unlocked files to archive: {self.path}')
+
+    def add_file(self, file, arcname):
+        """
+        Appends a file to the archive under the name arcname.
+        """
+
+        arcname = arcname.replace(os.sep, '/')
+        if self.format == ZIP:
+            info = zipfile.ZipInfo.from_file(file, arcname)
+            info.compress_type = self.archive.compression
+            with open(file, 'rb') as source, self.archive.open(info, 'w') as target:
+                shutil.copyfileobj(source, target, CHUNK_SIZE)
+        else:
+            info = self.archive.gettarinfo(file, arcname)
+            with open(file, 'rb') as source:
+                self.archive.addfile(info, source)
+        self.files += 1
+
+    def add_dir(self, arcname):
+        """
+        Adds an (empty) directory entry to the archive.
+        """
+
+        arcname = arcname.replace(os.sep, '/').rstrip('/')
+        if self.format == ZIP:
+            info = zipfile.ZipInfo(arcname + '/')
+            info.external_attr = (0o40755 << 16) | 0x10  # directory
+            self.archive.writestr(info, b'')
+        else:
+            info = tarfile.TarInfo(arcname)
+            info.type = tarfile.DIRTYPE
+            info.mode = 0o755
+            self.archive.addfile(info)
+
+    def move_file(self, file):
+        """
+        Appends a file in the staging folder to the archive and removes it from the staging folder.
+
+        Returns
+        -------
+        added: bool
+            True if the file was added
+        """
+
+        try:
+            self.add_file(file, os.path.relpath(file, self.staging_dir))
+        except:
+            logging.error(f'Failed to add file to archive: {file}')
+            return False
+        try:
+            os.remove(file)
+        except OSError:
+            logging.debug('Failed to remove staged file: %s', file)
+        return True
+
+    def add_tree(self, top):
+        """
+        Moves what is left in a folder in the staging folder (e.g. copied files that are not pdf files) into the
+        archive, empty directories included.
+        """
+
+        for root, dirs, files in os.walk(top):
+            for name in sorted(files):
+                self.move_file(os.path.join(root, name))
+            if not dirs and not files and root != top:
+                self.add_dir(os.path.relpath(root, self.staging_dir))
+
+    def close(self):
+        """
+        Finishes the archive (writes the central directory of a zip file) and removes the staging folder.
+        """
+
+        self.archive.close()
+        if self.output is not None:
+            self.output.close()
+        if self.own_staging:
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+        logging.info(f'Wrote {self.files} files to archive: {self.path}')
+
+    def abort(self):
+        """
+        Stops writing after an error: removes the unfinished archive and the staging folder.
+        """
+
+        try:
+            self.archive.close()
+        except Exception:
+            pass
+        if self.output is not None:
+            self.output.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        if self.own_staging:
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+        logging.error(f'Removed unfinished archive: {self.path}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -3,69 +3,96 @@ import os
 
 """
     This file is called from the main file PDF_unlock_tool.py and from the file _functions.unzip_files.py
-    
+
     Author: Joana Cardoso
 """
 
-logging.basicConfig(level=logging.DEBUG,
-                    format='%(asctime)s %(levelname)s %(funcName)s %(message)s',
-                    filename='Logging_UnlockTool.log'
-                    )  # to see log in console remove filename
+
+# Paths longer than this are shortened
+MAX_LENGTH = 246
+
+
+def listing(des_dir):
+    """
+    Returns the names in a directory as a set to pass as taken to shorten_names, empty if the directory does not
+    exist. One os.listdir instead of checking every shortened name on disk.
+    """
+
+    try:
+        return {os.path.normcase(name) for name in os.listdir(des_dir)}
+    except OSError:
+        return set()
+
+
+def shorten_names(des_dir, files, taken=None):
+    """
+    Checks the length of all files that are placed in one directory at once and shortens the names that are too
+    long. Shortened names are made unique against the names already taken (in memory, without looking on disk for
+    every file) by adding _1, _2, ... within the maximum length.
+
+    Parameters
+    ----------
+    des_dir: str
+        The path to the destination directory
+    files: list
+        The names of the files (without directory)
+    taken: set
+        The names (os.path.normcase) already used in des_dir, e.g. from the scanner or names given earlier. The
+        set is updated with the names given to files. Default is the names in des_dir (see listing)
+
+    Returns
+    -------
+    file_names: list
+        For every file a tuple (file_name, long_name): the path to be saved and True if the name was too long
+    """
+
+    prefix_length = len(os.path.join(des_dir, ''))
+    long_files = {file for file in files if prefix_length + len(file) > MAX_LENGTH}
+    if taken is None:
+        taken = listing(des_dir) if long_files else set()
+    # names that fit are kept as they are, so they are taken before any name is shortened
+    taken.update(os.path.normcase(file) for file in files if file not in long_files)
+
+    file_names = []
+    for file in files:
+        if file not in long_files:
+            file_names.append((os.path.join(des_dir, file), False))
+            continue
+        fileName, fileExtension = os.path.splitext(file)
+        max_length = max(MAX_LENGTH - 4 - prefix_length, 1)
+        name = fileName[:max_length] + fileExtension
+        counter = 1
+        while os.path.normcase(name) in taken:
+            suffix = '_' + str(counter)
+            name = fileName[:max(max_length - len(suffix), 1)] + suffix + fileExtension
+            counter += 1
+        taken.add(os.path.normcase(name))
+        file_name = os.path.join(des_dir, name)
+        logging.debug('Shortening name: %s into %s', file, file_name)
+        file_names.append((file_name, True))
+
+    return file_names
 
 
-def check_length(des_dir, file):
+def check_length(des_dir, file, taken=None):
     """
     Checks the length of the selected files
 
     Parameters
     ----------
-    des_dir: str 
+    des_dir: str
         The path to the destination directory
     file: str
         The path to the file
+    taken: set
+        The names already used in des_dir (see shorten_names)
 
     Returns
     -------
     file_name: str
         The name to be saved in case it has a too long name
-    long_name: bool 
+    long_name: bool
         Is True if the name is too long, default is False
     """
 
-    logging.info(f'Checking length')
-    counter = 1
-    long_name = False
-
-    if len(os.path.join(des_dir, file)) > 246:
-        long_name = True
-        logging.info(f'Long name:{long_name}')
-        try:
-            lastChunk = os.path.basename(file)
-            max_length = len(
-                lastChunk) - (len(os.path.join(des_dir, os.path.basename(file))) - 242)
-            logging.info(f'Max length:{max_length}')
-            fileName, fileExtension = os.path.splitext(lastChunk)
-            logging.info(f'File name: {fileName}')
-            logging.info(f'File extension: {fileExtension}')
-            file_name = os.path.join(des_dir, fileName.replace(fileName, fileName[
-                :max_length]) + fileExtension)
-            logging.debug(f'Shortening name: {file} into {file_name}')
-            logging.info(
-                f'Path length: {len(os.path.join(des_dir, os.path.basename(file)))}')
-        except:
-            logging.error(f'Failed to shorten name: {file} into {file_name}')
-        if os.path.exists(file_name):
-            logging.info(f'Path exists: {file_name}')
-            try:
-                file_name = os.path.join(des_dir, fileName.replace(fileName, fileName[
-                    :max_length]) + "_" + str(
-                    counter) + fileExtension)
-                counter += 1
-                logging.debug(f'Renaming: {file} into {file_name}')
-            except:
-                logging.error(f'Failed to rename: {file} into {file_name}')
-    else:
-        file_name = os.path.join(des_dir, file)
-        logging.info(f'Long name:{long_name}')
-
-    return file_name, long_name
+    return shorten_names(des_dir, [file], taken)[0]
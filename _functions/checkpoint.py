@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+
+"""
+    This file is called from the file _functions.pipeline.py and the file _functions.gui.py. It keeps a journal
+    (next to the output directory) of the files that were unzipped and unlocked, written while the tool runs, so a run
+    that was stopped or crashed can be resumed without doing the finished files again.
+"""
+
+
+# Stages recorded in the journal
+UNZIP = 'unzip'
+UNLOCK = 'unlock'
+
+# Outputs are written to a file with this suffix and renamed into place when they are complete
+TEMP_SUFFIX = '.part'
+
+
+def journal_path(out_dir):
+    """
+    Returns the path of the journal of an output directory: <out_dir>_journal.jsonl
+    """
+
+    return os.path.join(os.path.dirname(out_dir), os.path.basename(out_dir) + '_journal.jsonl')
+
+
+def temp_path(file_out):
+    """
+    Returns the temporary name an output is written to before it is renamed into place.
+    """
+
+    return file_out + TEMP_SUFFIX
+
+
+def replace_temp(file_out):
+    """
+    Renames the temporary file of an output into place. os.replace is atomic, so file_out is either the previous
+    file or the complete new file, never a partial file.
+    """
+
+    os.replace(temp_path(file_out), file_out)
+
+
+def remove_temp(file_out):
+    """
+    Removes the temporary file of an output that failed, if it exists.
+    """
+
+    try:
+        os.remove(temp_path(file_out))
+    except OSError:
+        pass
+
+
+def remove_stale_temps(out_dir):
+    """
+    Removes the temporary outputs (*.part) left in an output directory by a run that was stopped or crashed, so
+    they are not mistaken for unlocked files.
+
+    Returns
+    -------
+    removed: int
+        The number of removed files
+    """
+
+    removed = 0
+    for root, dirs, files in os.walk(out_dir):
+        for name in files:
+            if name.endswith(TEMP_SUFFIX):
+                try:
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+                except OSError:
+                    logging.error(f'Failed to remove temporary file: {os.path.join(root, name)}')
+    if removed:
+        logging.info(f'Removed {removed} temporary files of a previous run: {out_dir}')
+    return removed
+
+
+def open_journal(out_dir, resume=False):
+    """
+    Opens the journal of an output directory. With resume the records of the previous run are read and the
+    temporary outputs it left are removed (see remove_stale_temps).
+    """
+
+    if resume:
+        remove_stale_temps(out_dir)
+    return Journal(journal_path(out_dir), resume=resume)
+
+
+class Journal:
+    """
+    The files that were finished, stored as json lines with the stage, the source and the output. Every line is
+    appended with a single write and flushed to disk (fsync) before the next file is recorded, so after a crash the
+    journal holds every finished file; a last line that was cut off is ignored.
+
+    Attributes
+    ----------
+    path: str
+        The journal file
+    resumed: int
+        The number of records read from a previous run
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.records = {}
+        complete = True
+        if resume and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    complete = line.endswith('\n')
+                    try:
+                        record = json.loads(line)
+                        self.records[(record['stage'], record['source'])] = record['file_out']
+                    except (ValueError, KeyError):
+                        logging.debug('Skipping incomplete journal line: %s', line)
+            logging.info(f'Resuming from journal with {len(self.records)} records: {path}')
+        self.resumed = len(self.records)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file = open(path, 'a' if resume else 'w', encoding='utf-8')
+        if not complete:
+            self.file.write('\n')  # end the line that was cut off, so the next record starts on a new line
+
+    def is_done(self, stage, source, file_out=None):
+        """
+        Checks if a file was finished in a previous run and its output still exists.
+
+        Parameters
+        ----------
+        stage: str
+            UNZIP or UNLOCK
+        source: str
+            The path to the source file (for UNZIP the zip file joined with the name of the member)
+        file_out: str
+            The expected output, default is the output that was recorded
+        """
+
+        recorded = self.records.get((stage, source))
+        if recorded is None or (file_out is not None and recorded != file_out):
+            return False
+        return os.path.exists(recorded)
+
+    def output(self, stage, source):
+        """
+        Returns the recorded output of a finished file, or None.
+        """
+
+        return self.records.get((stage, source))
+
+    def record(self, stage, source, file_out):
+        """
+        Appends a finished file to the journal and flushes it to disk.
+        """
+
+        self.records[(stage, source)] = file_out
+        try:
+            self.file.write(json.dumps({'stage': stage, 'source': source, 'file_out': file_out}) + '\n')
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        except:
+            logging.error(f'Failed to write journal: {self.path}')
+
+    def close(self, remove=False):
+        """
+        Closes the journal. With remove the journal is deleted, e.g. when the run is complete.
+        """
+
+        self.file.close()
+        if remove:
+            try:
+                os.remove(self.path)
+                logging.info(f'Removed journal: {self.path}')
+            except OSError:
+                logging.error(f'Failed to remove journal: {self.path}')
@@ -0,0 +1,143 @@
+import mmap
+import re
+
+"""
+    This file is called from the file _functions.unlock_file.py. It is used to check cheaply, without parsing the whole
+    pdf, whether a pdf file has to be resaved at all. Only three small parts of the file are read: the end of the
+    file (startxref), the cross reference table with the trailer (to look for encryption and find the catalog) and
+    the catalog object (to look for metadata). A file where this does not work, e.g. with a cross reference stream
+    or the catalog in an object stream, is resaved.
+"""
+
+
+# Categories of pdf files, the first three are the result of the pre-check
+PLAIN = 'plain'  # not encrypted and no metadata: copied as is
+ENCRYPTED = 'encrypted'  # encrypted with a user password, cannot be unlocked
+RESAVED = 'resaved'  # not encrypted but resaved (e.g. to delete the metadata)
+RESTRICTED = 'restricted'  # encrypted with only an owner password (restrictions), unlocked
+
+TAIL_SIZE = 2048  # startxref is in the last 1024 bytes of a pdf, with some room for trailing garbage
+TRAILER_SIZE = 4096
+CATALOG_SIZE = 4096
+XREF_ENTRY_SIZE = 20  # every entry of a cross reference table is 20 bytes, end of line included
+
+STARTXREF = re.compile(rb'startxref\s+(\d+)')
+OBJECT = re.compile(rb'\d+\s+\d+\s+obj')
+ROOT = re.compile(rb'/Root\s+(\d+)\s+(\d+)\s+R')
+SUBSECTION = re.compile(rb'\s*(\d+)\s+(\d+)[ \t]*\r?\n')
+XREF_ENTRY = re.compile(rb'(\d{10})\s(\d{5})\s([nf])')
+
+
+def classify_buffer(buf):
+    """
+    Classifies the content of a pdf file.
+
+    Parameters
+    ----------
+    buf: bytes or mmap.mmap
+        The content of the pdf file
+
+    Returns
+    -------
+    category: str
+        ENCRYPTED if the trailer has an /Encrypt entry, PLAIN if the file is not encrypted and the catalog has no
+        /Metadata, RESAVED otherwise, also if the trailer or the catalog cannot be found in the last cross reference
+        table
+    """
+
+    tail = buf[-TAIL_SIZE:]
+    match = None
+    for match in STARTXREF.finditer(tail):
+        pass  # the last startxref is the one that counts
+    if match is None:
+        return RESAVED
+    offset = int(match.group(1))
+    if offset >= len(buf):
+        return RESAVED
+
+    if buf[offset:offset + 4] == b'xref':
+        # classic cross reference table followed by the trailer dictionary
+        start = buf.find(b'trailer', offset)
+        if start < 0:
+            return RESAVED
+        trailer = buf[start:start + TRAILER_SIZE]
+    elif OBJECT.match(buf, offset):
+        # cross reference stream, the trailer entries are in its dictionary. Its entries are compressed and the
+        # catalog may be in an object stream, so the file is only checked for encryption
+        trailer = buf[offset:offset + TRAILER_SIZE]
+        end = trailer.find(b'stream')
+        trailer = trailer[:end] if end >= 0 else trailer
+        if b'/XRef' in trailer and b'/Encrypt' in trailer:
+            return ENCRYPTED
+        return RESAVED
+    else:
+        return RESAVED
+
+    if b'/Encrypt' in trailer:
+        return ENCRYPTED
+    root = ROOT.search(trailer)
+    if root is None:
+        return RESAVED
+    catalog = find_object(buf, offset + 4, int(root.group(1)), int(root.group(2)))
+    if catalog is None or b'/Metadata' in catalog:
+        return RESAVED
+    return PLAIN
+
+
+def find_object(buf, position, number, generation):
+    """
+    Looks up an object in a cross reference table and returns its dictionary (up to CATALOG_SIZE bytes), None if
+    it is not in the table or not at the offset the table gives.
+
+    Parameters
+    ----------
+    buf: bytes or mmap.mmap
+        The content of the pdf file
+    position: int
+        The position in buf of the first subsection, after the keyword xref
+    number, generation: int
+        The object number and generation of the object
+    """
+
+    while True:
+        subsection = SUBSECTION.match(buf, position)
+        if subsection is None:
+            return None  # the trailer, the object is not in this table
+        first, count = int(subsection.group(1)), int(subsection.group(2))
+        position = subsection.end()
+        if first <= number < first + count:
+            break
+        position += count * XREF_ENTRY_SIZE
+    entry = XREF_ENTRY.match(buf, position + (number - first) * XREF_ENTRY_SIZE)
+    if entry is None or entry.group(3) != b'n' or int(entry.group(2)) != generation:
+        return None
+    offset = int(entry.group(1))
+    content = buf[offset:offset + CATALOG_SIZE]
+    header = re.match(rb'\s*' + str(number).encode() + rb'\s+' + str(generation).encode() + rb'\s+obj', content)
+    if header is None:
+        return None
+    end = content.find(b'endobj')
+    return content[header.end():end] if end >= 0 else content[header.end():]
+
+
+def classify_pdf(path):
+    """
+    Classifies a pdf file, using a memory map so only the parts that are looked at are read.
+
+    Parameters
+    ----------
+    path: str
+        The path to the pdf file
+
+    Returns
+    -------
+    category: str
+        PLAIN, ENCRYPTED or RESAVED (see classify_buffer)
+    """
+
+    try:
+        with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return classify_buffer(buf)
+    except (OSError, ValueError):
+        # e.g. an empty file, which cannot be memory mapped
+        return RESAVED
@@ -0,0 +1,101 @@
+import concurrent.futures
+import logging
+import os
+import shutil
+import _functions.unlock_cache as uc
+
+"""
+    This file is called from the file _functions.pipeline.py. It is used to find pdf files with the same content, so
+    every unique pdf is unlocked once and the result is linked or copied to the other places.
+"""
+
+
+def group_duplicates(files, sizes, workers=None):
+    """
+    Groups files with the same content. Only files with the same size are hashed (in a thread pool, hashlib
+    releases the GIL while hashing).
+
+    Parameters
+    ----------
+    files: list
+        The paths to the files
+    sizes: dict
+        The size of every file
+    workers: int
+        The number of hashing threads, default is chosen by concurrent.futures
+
+    Returns
+    -------
+    originals: list
+        One file of every unique content, in the order of files
+    duplicates: dict
+        For every original with copies, the list of files with the same content
+    """
+
+    by_size = {}
+    for file in files:
+        by_size.setdefault(sizes[file], []).append(file)
+    candidates = [file for same_size in by_size.values() if len(same_size) > 1 for file in same_size]
+
+    hashes = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for file, digest in zip(candidates, executor.map(_hash_or_none, candidates)):
+            hashes[file] = digest
+
+    originals = []
+    duplicates = {}
+    first = {}
+    for file in files:
+        digest = hashes.get(file)
+        if digest is None:
+            originals.append(file)
+        elif (sizes[file], digest) in first:
+            duplicates.setdefault(first[(sizes[file], digest)], []).append(file)
+        else:
+            first[(sizes[file], digest)] = file
+            originals.append(file)
+    logging.info(f'Found {len(files) - len(originals)} duplicate files')
+
+    return originals, duplicates
+
+
+def _hash_or_none(file):
+    try:
+        return uc.hash_file(file)
+    except OSError:
+        logging.error(f'Failed to hash file: {file}')
+        return None
+
+
+def place_duplicate(original_out, file_out):
+    """
+    Places the unlocked file of an original at the output path of a duplicate: as a hard link if the file system
+    allows it, otherwise as a copy (shutil.copyfile uses the fast copy functions of the os where possible).
+
+    Parameters
+    ----------
+    original_out: str
+        The unlocked file of the original
+    file_out: str
+        The output path of the duplicate
+
+    Returns
+    -------
+    placed: bool
+        True if the file was linked or copied
+    """
+
+    try:
+        os.makedirs(os.path.dirname(file_out), exist_ok=True)
+        if os.path.exists(file_out):
+            os.remove(file_out)
+        try:
+            os.link(original_out, file_out)
+            logging.debug('Linking duplicate: %s', file_out)
+        except OSError:
+            shutil.copyfile(original_out, file_out)
+            logging.debug('Copying duplicate: %s', file_out)
+    except:
+        logging.error(f'Failed to place duplicate: {file_out}')
+        return False
+    return True
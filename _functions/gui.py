@@ -0,0 +1,289 @@
+import logging
+import os
+import threading
+import tkinter as tk
+from tkinter import messagebox, filedialog
+import _functions.checkpoint as ck
+import _functions.log_config as lc
+import _functions.unzip_files as uz
+import _functions.unlock_file as uf
+import _functions.pipeline as pl
+import _functions.scan_files as sf
+
+"""
+    This file is called from the main file PDF_unlock_tool.py. It contains the screens of the tool. It is only
+    imported when the gui is started, so the command line tool and the worker processes do not load tkinter.
+
+    Author: Joana Cardoso
+"""
+
+
+class Application(tk.Frame):
+    """
+    This class is a python gui to unlock pdf files.
+    Provides functionality such as:
+    - Selecting de file location (including unzipping of zip files)
+    - Determining the amount of pdf files available for unlocking
+    - Unlocking pdf files
+    - Determining the amount of unlocked files
+    - Making a log file where all the steps can be followed and errors can be traced
+
+    Methods
+    -------
+    folder_type()
+        Sets up a screen to select the location of the pdf documents for unlocking
+    select_zip()
+        Calls _functions.unzip_file.unzip_files and gets the path to the selected file
+    select_folder()
+        Gets the path to the selected folder and calls _functions.pipeline.prepare_folder
+    find_pdf_files()
+        Gets the amount of pdf files found in the selected folder or zip file and presents the results in a screen
+    open_folder(path: str)
+        Opens the links in the last screen of the tool
+    process_pdf()
+        Converts the selected files to pdf
+    """
+
+    def __init__(self, parent):
+        """
+        Initializes the tool and sets up a start screen.
+        """
+
+        parent.withdraw()
+        self.progress = None
+        self.style = None
+        self.single_file = False
+        self.manifest = None
+        self.journal = None
+        tk.Frame.__init__(self, master=parent)
+        info = 'This application unlocks protected pdf files.\n\nSelect a folder to start unlocking.\n\nThis application is developed by the Data Wharehouse team of the Province of Zuid-Holland, The Netherlands.'
+        self.parent = parent
+        parent.iconbitmap('logo.ico')
+        messagebox.showinfo(title=None, message=info)
+        self.folder_type()
+
+    def folder_type(self):
+        """
+        This function sets up a screen to select the location of the pdf documents for unlocking.
+        """
+
+        self.parent = tk.Tk()
+        w = self.parent.winfo_reqwidth()
+        h = self.parent.winfo_reqheight()
+        ws = self.parent.winfo_screenwidth()
+        hs = self.parent.winfo_screenheight()
+        x = (ws / 2.3) - (w / 2.3)
+        y = (hs / 2) - (h / 2)
+        self.parent.geometry('+%d+%d' % (x, y))
+        self.parent.iconbitmap('logo.ico')
+        self.parent.title('File type')
+        text = 'What do you want to select?'
+        self.parent.resizable(width="false", height="false")
+        self.parent.minsize(width=250, height=75)
+        self.parent.maxsize(width=250, height=75)
+        self.label = tk.Label(self.parent, text=text).place(
+            relx=.1, rely=.2, anchor="w")
+        self.button2 = tk.Button(self.parent, text='Folder', command=self.select_folder).place(
+            relx=.38, rely=.7, anchor="c")
+        self.button3 = tk.Button(self.parent, text='Zipped folder',
+                                 command=self.select_zip).place(relx=.64, rely=.7, anchor="c")
+        self.quit = tk.Button(self.parent, text='Stop', command=self.cancel).place(
+            relx=.88, rely=.7, anchor="c")
+        self.parent.protocol("WM_DELETE_WINDOW", self.cancel)
+
+    def select_zip(self):
+        """
+        If the option zip file is selected in the folder_type screen, this function calls _functions.unzip_file.unzip_files and 
+            gets the path to the selected file.
+        """
+
+        self.parent.destroy()
+        zip_dir = filedialog.askopenfilename(initialdir="/Users", title="Zipped folder selection",
+                                             filetypes=(("ZIP files", "*.ZIP"), ("zip files", "*.zip")))
+        if not zip_dir:
+            logging.info('Back to selection folder type')
+            self.folder_type()
+
+        else:
+            self.zip_dir = os.path.abspath(zip_dir)
+            self.process_dir = os.path.abspath(os.path.splitext(zip_dir)[0])
+            logging.info(f'Zip_dir: {zip_dir}')
+            logging.info(f'Process directory: {self.process_dir}')
+            logging.info(f'Started unzipping folder: {zip_dir}')
+            self.open_journal()
+            uz.unzip_files(self.zip_dir, self.process_dir, journal=self.journal)
+            self.manifest = sf.scan_files(self.process_dir)
+            self.find_pdf_files()
+
+    def select_folder(self):
+        """
+        If the option folder is selected in the folder_type screen, this function gets the path to the selected folder.
+        It calls the function prepare_folder in file _functions.pipeline, which shortens too long names
+        and unzips zip files.
+        """
+
+        self.parent.destroy()
+        process_dir = filedialog.askdirectory(
+            initialdir="/Users", title="Folder selection")
+
+        if not process_dir:
+            logging.info('Back to select folder type')
+            self.folder_type()
+
+        else:
+            self.process_dir = os.path.abspath(process_dir)
+            logging.info(f'Process directory: {self.process_dir}')
+            self.open_journal()
+            self.manifest = pl.prepare_folder(self.process_dir, journal=self.journal)
+            self.find_pdf_files()
+
+    def open_journal(self):
+        """
+        Opens the checkpoint journal of the output directory. The journal only exists if a previous run on the same
+        folder was stopped or crashed, the files it finished are then skipped.
+        """
+
+        out_dir = pl.default_out_dir(self.process_dir)
+        self.journal = ck.open_journal(out_dir, resume=os.path.exists(ck.journal_path(out_dir)))
+
+    def find_pdf_files(self):
+        """
+        Gets the amount of pdf files found in the selected folder or zip file and presents the results in a screen.
+        """
+
+        # count pdf files
+        self.files_to_unlock, self.empty_dir = pl.find_pdf_files(self.manifest)
+        self.pdf_files = len(self.files_to_unlock)
+
+        # print messages
+        total_pdfs_unlock = 'Number of pdf\'s found: ' + str(self.pdf_files)
+
+        self.parent = tk.Tk()
+        w = self.parent.winfo_reqwidth()
+        h = self.parent.winfo_reqheight()
+        ws = self.parent.winfo_screenwidth()
+        hs = self.parent.winfo_screenheight()
+        x = (ws / 2.3) - (w / 2.3)
+        y = (hs / 2) - (h / 2)
+        self.parent.geometry('+%d+%d' % (x, y))
+        self.parent.iconbitmap('logo.ico')
+        self.parent.title('Found pdf\'s')
+        self.parent.resizable(width="false", height="false")
+        self.parent.minsize(width=275, height=100)
+        self.parent.maxsize(width=275, height=100)
+        self.label = tk.Label(self.parent, text=total_pdfs_unlock).place(
+            relx=.1, rely=.2, anchor="w")
+        self.contin = tk.Button(self.parent, text='Continue', command=self.process_pdf).place(
+            relx=.68, rely=.7, anchor="c")
+        self.quit = tk.Button(self.parent, text='Stop', command=self.cancel).place(
+            relx=.86, rely=.7, anchor="c")
+        self.parent.protocol("WM_DELETE_WINDOW", self.cancel)
+
+    def open_folder(self, path):
+        """
+        Opens the link to the unloked files in the last screen.
+
+        Parameters
+        ----------
+        path: str
+            The path to the link
+        """
+
+        os.startfile(path, 'open')
+
+    def process_pdf(self):
+        """
+        This function unlocks pdf files, counts the unloked files and presents the results in a final screen.
+        Calls the function unlock_pdf in file _functions.unlock_file.
+        """
+
+        self.parent.destroy()
+        # set output directory
+        out_dir = pl.default_out_dir(self.process_dir)
+        logging.info(f'Output directory: {out_dir}')
+
+        # skip the files unlocked by a previous run that was stopped
+        files_to_unlock = [file for file in self.files_to_unlock
+                           if not self.journal.is_done(ck.UNLOCK, file, file.replace(self.process_dir, out_dir))]
+        resumed = len(self.files_to_unlock) - len(files_to_unlock)
+        if resumed:
+            logging.info(f'Skipped {resumed} pdf files unlocked in a previous run')
+
+        cancel = threading.Event()
+        results = uf.unlock_pdf(files_to_unlock=files_to_unlock, process_dir=self.process_dir, 
+                                out_dir=out_dir, cancel=cancel, journal=self.journal)
+        if cancel.is_set():
+            # Stop was pressed in the progress window, the journal is kept to continue next time
+            self.journal.close()
+            lc.stop_logging()
+            self.master.quit()
+            return
+        logging.info('Finished unlocking PDF files')
+
+        # make empty directories if they exist in the original directory
+        pl.create_empty_dirs(self.empty_dir, self.process_dir, out_dir)
+
+        self.journal.close(remove=True)
+
+        # count unlocked PDF's
+        unlocked_pdfs = resumed + sum(1 for result in results if result.unlocked)
+
+        # print messages
+        ready = 'Tool is ready.'
+        total_unlocked = 'Number of unlocked files: ' + str(unlocked_pdfs)
+        output = 'Unlocked pdf files are in folder: ' + out_dir
+        output2 = 'Check if unlocked files can be edited.'
+
+        self.parent = tk.Tk()
+        w = self.parent.winfo_reqwidth()
+        h = self.parent.winfo_reqheight()
+        ws = self.parent.winfo_screenwidth()
+        hs = self.parent.winfo_screenheight()
+        x = (ws / 3) - (w / 3)
+        y = (hs / 2.3) - (h / 2.3)
+        self.parent.geometry('+%d+%d' % (x, y))
+        self.parent.iconbitmap('logo.ico')
+        self.parent.title('Unlocked files')
+        self.parent.resizable(width="false", height="false")
+        self.parent.minsize(width=800, height=150)
+        self.parent.maxsize(width=800, height=150)
+        self.label = tk.Label(self.parent, text=ready).place(
+            relx=.03, rely=.1, anchor="w")
+        self.label = tk.Label(self.parent, text=total_unlocked).place(
+            relx=.03, rely=.25, anchor="w")
+
+        # Define clickable labels
+        label1 = tk.Label(self.parent, text=output, fg='blue', cursor='hand2')
+        label1.pack()
+        label1.bind("<Button-1>", lambda e: self.open_folder(out_dir))
+        self.label1 = label1.place(relx=.03, rely=.6, anchor="w")
+
+        self.label = tk.Label(self.parent, text=output2).place(
+            relx=.03, rely=.4, anchor="w")
+
+        self.quit = tk.Button(self.parent, text='Close', command=self.ready).place(
+            relx=.95, rely=.8, anchor="c")
+        self.parent.protocol("WM_DELETE_WINDOW", self.ready)
+
+    def cancel(self):
+        """
+        Cancels the tool and inserts info in the log file if the process is stopped half-way. A journal without
+        finished files is removed, there is nothing to continue next time.
+        """
+
+        if self.journal is not None and not self.journal.file.closed:
+            self.journal.close(remove=not self.journal.records)
+        self.parent.destroy()
+        self.parent.quit()
+        logging.info('Tool cancelled')
+        lc.stop_logging()
+
+    def ready(self):
+        """
+        Destroys the tool and inserts info in the log file when the process is ended.
+        """
+
+        self.parent.destroy()
+        self.parent.quit()
+        logging.info('Ready with tool')
+        lc.stop_logging()
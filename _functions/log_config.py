@@ -0,0 +1,155 @@
+import atexit
+import logging
+import logging.handlers
+import multiprocessing
+import pickle
+import socket
+import threading
+
+"""
+    This file is called from the main file PDF_unlock_tool.py and the command line entry point PDF_unlock_cli.py.
+    It sets up the log file once for the whole tool. Log records are put on a queue and written to the (rotating)
+    log file by a background thread, so the steps of the tool never wait for the disk. Worker processes send their
+    records to the same queue. Supervised workers (see _functions.watchdog) can be killed at any moment, also while
+    they hold the lock of the queue, so they send every record as one datagram to a socket of this process instead.
+"""
+
+LOG_FILE = 'Logging_UnlockTool.log'
+LOG_FORMAT = '%(asctime)s %(levelname)s %(funcName)s %(message)s'
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+
+_queue = None
+_listener = None
+_receiver = None
+
+
+def setup_logging(level=logging.DEBUG, filename=LOG_FILE, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT):
+    """
+    Sends all log records to a queue that is written to the log file by a background thread.
+
+    Parameters
+    ----------
+    level: int or str
+        The log level, e.g. logging.INFO or 'INFO'
+    filename: str
+        The log file, None logs to the console
+    max_bytes: int
+        The size at which the log file is rotated, 0 never rotates
+    backup_count: int
+        The number of rotated log files that are kept
+    """
+
+    global _queue, _listener
+    stop_logging()
+
+    if filename:
+        handler = logging.handlers.RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count,
+                                                       encoding='utf-8')
+    else:
+        handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    _queue = multiprocessing.Queue(-1)
+    _listener = logging.handlers.QueueListener(_queue, handler)
+    _listener.start()
+    _use_queue(_queue, level)
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """
+    Writes the records that are still on the queue to the log file and stops the background thread.
+    """
+
+    global _listener, _receiver
+    if _receiver is not None:
+        _receiver.stop()
+        _receiver = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def worker_initializer(supervised=False):
+    """
+    Returns the initializer and initargs for a pool of worker processes, so the workers log to the same queue.
+    Without setup_logging the workers keep the default logging.
+
+    Parameters
+    ----------
+    supervised: bool
+        The workers can be killed (see _functions.watchdog), they log through a socket instead of the queue
+
+    Returns
+    -------
+    initializer: callable
+        None if logging is not set up
+    initargs: tuple
+    """
+
+    global _receiver
+    if _listener is None:
+        return None, ()
+    if supervised:
+        if _receiver is None:
+            _receiver = _Receiver(_queue)
+        return _use_socket, (_receiver.address, logging.getLogger().level)
+    return _use_queue, (_queue, logging.getLogger().level)
+
+
+def _use_queue(queue, level):
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(queue))
+    root.setLevel(level)
+
+
+def _use_socket(address, level):
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_DatagramHandler(*address))
+    root.setLevel(level)
+
+
+class _DatagramHandler(logging.handlers.DatagramHandler):
+    """
+    Sends every log record as one pickled datagram, so a writer that is killed never leaves half a record behind.
+    """
+
+    def makePickle(self, record):
+        return super().makePickle(record)[4:]  # no length in front, a datagram is received whole
+
+
+class _Receiver:
+    """
+    Receives the log records of supervised workers on a local UDP socket and puts them on the queue of the log file.
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(('127.0.0.1', 0))
+        self.address = self.socket.getsockname()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            data = self.socket.recv(65536)
+            if not data:
+                return
+            try:
+                self.queue.put_nowait(logging.makeLogRecord(pickle.loads(data)))
+            except Exception:
+                pass
+
+    def stop(self):
+        # an empty datagram stops the thread
+        self.socket.sendto(b'', self.address)
+        self.thread.join()
+        self.socket.close()
@@ -0,0 +1,136 @@
+import heapq
+import json
+import os
+import time
+from contextlib import contextmanager
+
+"""
+    This file is called from the file _functions.pipeline.py and the command line entry point PDF_unlock_cli.py.
+    It collects timings and sizes per file and per step of the tool, and can export them as json lines or as a
+    Prometheus textfile (for the node exporter).
+
+    A metrics record is a dict with at least 'type' ('file' or 'stage'), 'stage' (e.g. 'unzip', 'unlock') and
+    'seconds'. File records also have 'file', 'file_out', 'bytes_in', 'bytes_out' and 'error' (the failure reason),
+    unlock records add 'category', 'pages' and the seconds of every step ('open', 'strip', 'save', ...).
+"""
+
+
+def unlock_record(result):
+    """
+    Returns the metrics record of an UnlockResult (see _functions.unlock_file).
+    """
+
+    record = {'type': 'file', 'stage': 'unlock'}
+    record.update(result._asdict())
+    record.update(record.pop('metrics') or {})
+    return record
+
+
+@contextmanager
+def timed_stage(on_metrics, name):
+    """
+    Times a stage of the tool and sends a stage record to on_metrics (if it is not None):
+
+        with timed_stage(on_metrics, 'unlock'):
+            ...
+    """
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if on_metrics is not None:
+            on_metrics({'type': 'stage', 'stage': name, 'seconds': time.perf_counter() - start})
+
+
+class MetricsCollector:
+    """
+    Receives metrics records (it is called with every record), keeps totals per stage and the slowest files, and
+    passes the records on to exporters.
+
+    Attributes
+    ----------
+    stages: dict
+        Per stage: the seconds of the stage (if timed) and the number of files, failures and bytes in and out
+    slowest_n: int
+        The number of slowest file records that are kept
+    """
+
+    def __init__(self, exporters=(), slowest_n=10):
+        self.exporters = list(exporters)
+        self.slowest_n = slowest_n
+        self.stages = {}
+        self._slowest = []  # heap of (seconds, number, record), the fastest of the kept records first
+        self._number = 0
+
+    def __call__(self, record):
+        stage = self.stages.setdefault(record['stage'], {'seconds': 0.0, 'files': 0, 'failed': 0,
+                                                         'bytes_in': 0, 'bytes_out': 0})
+        if record['type'] == 'stage':
+            stage['seconds'] += record['seconds']
+        else:
+            stage['files'] += 1
+            stage['failed'] += 1 if record.get('error') else 0
+            stage['bytes_in'] += record.get('bytes_in') or 0
+            stage['bytes_out'] += record.get('bytes_out') or 0
+            self._number += 1
+            item = (record.get('seconds') or 0, self._number, record)
+            if len(self._slowest) < self.slowest_n:
+                heapq.heappush(self._slowest, item)
+            elif self._slowest and item > self._slowest[0]:
+                heapq.heapreplace(self._slowest, item)
+        for exporter in self.exporters:
+            exporter(record)
+
+    def slowest(self):
+        """
+        Returns the file records that took the longest, the slowest first.
+        """
+
+        return [record for seconds, number, record in sorted(self._slowest, reverse=True)]
+
+
+class JsonLinesExporter:
+    """
+    Writes every metrics record as a json line to a file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def __call__(self, record):
+        self.file.write(json.dumps(record, default=str) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+def write_prometheus_textfile(path, collector):
+    """
+    Writes the stage totals of a collector in the Prometheus text format. The file is written to a temporary
+    file first and then renamed, as the node exporter textfile collector expects.
+
+    Parameters
+    ----------
+    path: str
+        The .prom file
+    collector: MetricsCollector
+        The collected metrics
+    """
+
+    metrics = [('pdf_unlock_stage_seconds', 'gauge', 'Seconds spent in the stage', 'seconds'),
+               ('pdf_unlock_files_total', 'counter', 'Files handled in the stage', 'files'),
+               ('pdf_unlock_failed_total', 'counter', 'Files that failed in the stage', 'failed'),
+               ('pdf_unlock_bytes_in_total', 'counter', 'Bytes read in the stage', 'bytes_in'),
+               ('pdf_unlock_bytes_out_total', 'counter', 'Bytes written in the stage', 'bytes_out')]
+    lines = []
+    for name, kind, help_text, key in metrics:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for stage, totals in sorted(collector.stages.items()):
+            lines.append(f'{name}{{stage="{stage}"}} {totals[key]}')
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        file.write('\n'.join(lines) + '\n')
+    os.replace(temp_path, path)
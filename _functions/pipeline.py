@@ -0,0 +1,620 @@
+import logging
+import os
+import shutil
+from pathlib import Path
+import _functions.archive_output as ao
+import _functions.check_length as cl
+import _functions.checkpoint as ck
+import _functions.dedup_files as dd
+import _functions.metrics as mt
+import _functions.scan_files as sf
+import _functions.unlock_cache as uc
+import _functions.unlock_file as uf
+import _functions.unzip_files as uz
+import _functions.watchdog as wd
+import _functions.work_queue as wq
+
+"""
+    This file is called from the main file PDF_unlock_tool.py and from the command line entry point PDF_unlock_cli.py.
+    It contains the steps of the tool (unzip, rename, find, unlock, count) without any user interface, so they can
+    also be run on machines without a display.
+"""
+
+
+def default_out_dir(process_dir):
+    """
+    Returns the default output directory: a folder next to the process directory ending in _unlocked
+
+    Parameters
+    ----------
+    process_dir: str
+        The directory of the selected folder
+    """
+
+    return os.path.join(os.path.dirname(process_dir), os.path.basename(process_dir) + '_unlocked')
+
+
+def prepare_folder(process_dir, on_metrics=None, journal=None):
+    """
+    Scans the selected folder once, shortens too long file names and unzips (and removes) the zip files found.
+
+    Parameters
+    ----------
+    process_dir: str
+        The directory of the selected folder
+    on_metrics: callable
+        Called with a metrics record (see _functions.metrics) for every unzipped file
+    journal: Journal
+        The checkpoint journal (see _functions.checkpoint) of the unzipped files
+
+    Returns
+    -------
+    manifest: Manifest
+        The files and empty directories in the folder after renaming and unzipping
+    """
+
+    manifest = sf.scan_files(process_dir)
+    entries = []
+    for entry in shorten_long_names(manifest):
+        if entry.kind == sf.ZIP:
+            zip_dir = entry.path
+            proc_zip = os.path.abspath(
+                os.path.splitext(zip_dir)[0])
+            logging.debug('Zip_dir: %s', zip_dir)
+            logging.debug('Proc dir: %s', proc_zip)
+            uz.unzip_files(zip_dir, proc_zip, on_metrics=on_metrics, journal=journal)
+            try:
+                os.remove(zip_dir)
+                logging.debug('Removed zip: %s', zip_dir)
+            except:
+                logging.error(f'Failed to remove zip: {zip_dir}')
+                entries.append(entry)
+            # unzip_files already shortened the names and unzipped the sub-zips
+            entries.extend(sf.scan_files(proc_zip).entries)
+            continue
+        entries.append(entry)
+    manifest.entries = entries
+
+    return manifest
+
+
+def shorten_long_names(manifest):
+    """
+    Renames the files with too long paths. The new names of a directory are made at once with
+    check_length.shorten_names, against the names the scanner found in that directory, so no name is looked up
+    on disk and two files never get the same name.
+
+    Parameters
+    ----------
+    manifest: Manifest
+        The files and empty directories in the selected folder
+
+    Returns
+    -------
+    entries: list
+        The entries of the manifest, with the new paths of the renamed files
+    """
+
+    names = {}  # des_dir: the names in the directory (files and directories)
+    long_entries = {}  # des_dir: the entries with a too long path
+    for entry in manifest.entries:
+        path = entry.path
+        while len(path) > len(manifest.top):
+            des_dir, name = os.path.split(path)
+            names.setdefault(des_dir, set()).add(os.path.normcase(name))
+            path = des_dir
+        if entry.long_name:
+            long_entries.setdefault(os.path.dirname(entry.path), []).append(entry)
+
+    renamed = {}
+    for des_dir, group in long_entries.items():
+        file_names = cl.shorten_names(des_dir, [os.path.basename(entry.path) for entry in group],
+                                      taken=names[des_dir])
+        for entry, (file_name, long_name) in zip(group, file_names):
+            try:
+                os.rename(entry.path, file_name)
+                logging.debug('Changing name: %s into %s', entry.path, file_name)
+                renamed[entry.path] = entry._replace(path=file_name, long_name=False)
+            except:
+                logging.error(f'Failed to change name: {entry.path} into {file_name}')
+
+    return [renamed.get(entry.path, entry) for entry in manifest.entries]
+
+
+def find_pdf_files(manifest):
+    """
+    Gets the pdf files and the empty directories from the scanned folder.
+
+    Parameters
+    ----------
+    manifest: Manifest
+        The files and empty directories in the selected folder
+
+    Returns
+    -------
+    files_to_unlock: list
+        The paths to the pdf files
+    empty_dir: list
+        The paths to the empty directories
+    """
+
+    logging.info('Find pdf files')
+
+    return manifest.pdf_files, manifest.empty_dirs
+
+
+def create_empty_dirs(empty_dir, process_dir, out_dir):
+    """
+    Makes the empty directories of the original directory in the output directory.
+
+    Parameters
+    ----------
+    empty_dir: list
+        The paths to the empty directories in the process directory
+    process_dir: str
+        The directory of the selected folder
+    out_dir: str
+        The output directory where converted files are placed
+    """
+
+    if len(empty_dir) > 0:
+        logging.info('Started creating empty directories')
+        for emp_dir in empty_dir:
+            create_emp_dir = emp_dir.replace(process_dir, out_dir)
+            try:
+                # Create empty directory in output dir
+                Path(create_emp_dir).mkdir(parents=True, exist_ok=True)
+                logging.debug('Creating empty directory: %s', create_emp_dir)
+            except:
+                logging.error(
+                    f'Failed to create empty directory: {create_emp_dir}')
+        logging.info('Finished creating empty directories')
+
+
+def unlock_zip(zip_dir, out_dir, workers=None, non_pdf='skip', progress=None, fast_path=True, on_metrics=None,
+               journal=None, max_bytes=uf.MAX_IN_FLIGHT_BYTES, pool=None, writer=None, profile=uf.DEFAULT_PROFILE,
+               timeout=None, max_rss=None):
+    """
+    Unlocks the pdf files in a zip file (and nested zip files) without unzipping it: pdf files are read from the
+    zip file into memory when they are sent to a worker and saved directly in the output directory.
+
+    Parameters
+    ----------
+    zip_dir: str
+        The path to the selected zip file
+    out_dir: str
+        The output directory where converted files will be placed
+    workers: int
+        The number of worker processes used for unlocking, default is the number of cpu's
+    non_pdf: str
+        What to do with files that are not pdf files: 'skip' them or 'copy' them to the output directory
+    progress: callable
+        Called as progress(done, total) after every unlocked file, total is None since it is not known in advance
+    fast_path: bool
+        Copy pdf files that are not encrypted and have no metadata instead of resaving them
+    on_metrics: callable
+        Called with a metrics record (see _functions.metrics) for every pdf file
+    journal: Journal
+        The checkpoint journal (see _functions.checkpoint), pdf files that were unlocked in a previous run are skipped
+    max_bytes: int
+        The maximum total size of the large pdf files that are unlocked at the same time (see uf.run_jobs)
+    pool: WorkerPool
+        A pool of worker processes that is kept after this zip file (see uf.run_jobs)
+    writer: ArchiveWriter
+        Moves every unlocked file from out_dir (the staging folder) into an archive (see _functions.archive_output)
+    profile: str
+        The save profile of the resave step (see uf.SAVE_PROFILES)
+    timeout: float
+        The maximum seconds for one pdf file, the file is quarantined when it takes longer (see uf.run_jobs)
+    max_rss: int
+        The maximum resident memory in bytes of a worker process (see uf.run_jobs)
+
+    Returns
+    -------
+    pdf_files: int
+        The number of pdf files found
+    unlocked_pdfs: int
+        The number of unlocked pdf files, including the ones skipped because of the journal
+    failed: list
+        The pdf files that could not be unlocked
+    categories: dict
+        The number of pdf files per category (see _functions.classify_pdf)
+    sizes: dict
+        The total bytes in and out of the unlocked pdf files
+    quarantined: list
+        The pdf files whose worker process was killed and why (file, reason)
+    """
+
+    def jobs():
+        nonlocal pdf_files, resumed
+        taken = {}  # des_dir: the names given in the directory, see check_length.shorten_names
+        for zip_file, info, des_path in uz.iter_zip_members(zip_dir, out_dir, keep_open=True):
+            des_dir, filename = os.path.split(des_path)
+            if info.is_dir():
+                Path(des_path).mkdir(parents=True, exist_ok=True)
+            elif filename.lower().endswith('.pdf'):
+                pdf_files += 1
+                file = os.path.join(zip_dir, info.filename)
+                if journal is not None and journal.is_done(ck.UNLOCK, file):
+                    resumed += 1
+                    # its (shortened) name stays taken, so no other member gets it
+                    taken.setdefault(des_dir, set()).add(
+                        os.path.normcase(os.path.basename(journal.output(ck.UNLOCK, file))))
+                    continue
+                file_out = cl.check_length(des_dir=des_dir, file=filename, taken=taken.setdefault(des_dir, set()))[0]
+                # read by run_jobs when the pdf file is sent to a worker
+                yield uz.ZipMember(zip_file, info), file, file_out
+            elif non_pdf == 'copy':
+                file_out = cl.check_length(des_dir=des_dir, file=filename, taken=taken.setdefault(des_dir, set()))[0]
+                try:
+                    Path(des_dir).mkdir(parents=True, exist_ok=True)
+                    with zip_file.open(info) as member, open(file_out, 'wb') as output:
+                        shutil.copyfileobj(member, output)
+                    logging.debug('Copying file: %s', filename)
+                except:
+                    logging.error(f'Failed to copy: {filename}')
+
+    logging.info('Started unlocking PDF files')
+    failed = []
+    pdf_files = 0
+    unlocked_pdfs = 0
+    resumed = 0
+    categories = {}
+    sizes = {'bytes_in': 0, 'bytes_out': 0}
+    quarantined = []
+    results = uf.run_jobs(jobs(), workers=workers, max_bytes=max_bytes, pool=pool, timeout=timeout, max_rss=max_rss,
+                          fast_path=fast_path, profile=profile)
+    for done, result in enumerate(results, start=1):
+        if on_metrics is not None:
+            on_metrics(mt.unlock_record(result))
+        if result.category is not None:
+            categories[result.category] = categories.get(result.category, 0) + 1
+        if result.unlocked and writer is not None and not writer.move_file(result.file_out):
+            result = result._replace(unlocked=False, error='failed to add to archive')
+        if result.unlocked:
+            unlocked_pdfs += 1
+            add_sizes(sizes, result)
+            if journal is not None:
+                journal.record(ck.UNLOCK, result.file, result.file_out)
+        else:
+            failed.append(result.file)
+            if result.category == wd.QUARANTINED:
+                quarantined.append((result.file, result.error))
+        if progress is not None:
+            progress(done, None)
+    logging.info('Finished unlocking PDF files')
+    if resumed:
+        logging.info(f'Skipped {resumed} pdf files unlocked in a previous run')
+
+    return pdf_files, unlocked_pdfs + resumed, failed, categories, sizes, quarantined
+
+
+def add_sizes(sizes, result):
+    """
+    Adds the bytes in and out of an unlocked file (see uf.resave_pdf) to the totals in sizes.
+    """
+
+    metrics = result.metrics or {}
+    sizes['bytes_in'] += metrics.get('bytes_in', 0)
+    sizes['bytes_out'] += metrics.get('bytes_out', 0)
+
+
+def unlock_tree(src, dst=None, workers=None, progress=None, stream=False, non_pdf='skip', incremental=False,
+                use_hash=False, prune=False, dedup=False, fast_path=True, on_metrics=None, resume=False,
+                max_bytes=uf.MAX_IN_FLIGHT_BYTES, pool=None, archive=None, profile=uf.DEFAULT_PROFILE, read_ahead=0,
+                scratch_dir=None, timeout=None, max_rss=None):
+    """
+    Runs the whole tool on a folder or zip file: unzip, rename, find, unlock and count.
+
+    Parameters
+    ----------
+    src: str
+        The path to the folder or zip file with pdf files
+    dst: str
+        The output directory, default is the folder (or zip file name) followed by _unlocked
+    workers: int
+        The number of worker processes used for unlocking, default is the number of cpu's
+    progress: callable
+        Called as progress(done, total) after every unlocked file
+    stream: bool
+        If src is a zip file, unlock the pdf files directly from the zip file without unzipping it first
+    non_pdf: str
+        In stream mode, what to do with files that are not pdf files: 'skip' them or 'copy' them
+    incremental: bool
+        Skip the pdf files that were unlocked in a previous run and did not change (not used in stream mode)
+    use_hash: bool
+        In incremental mode, also compare the content hash of files with a changed modification time
+    prune: bool
+        In incremental mode, remove the unlocked files of pdf files that no longer exist
+    dedup: bool
+        Unlock pdf files with the same content once and link or copy the result to the duplicates
+        (not used in stream mode)
+    fast_path: bool
+        Copy pdf files that are not encrypted and have no metadata instead of resaving them
+    on_metrics: callable
+        Called with a metrics record (see _functions.metrics) for every file and stage, e.g. a MetricsCollector
+    resume: bool
+        Skip the files that were unzipped and unlocked by a run that was stopped or crashed. The files that are
+        finished are always recorded in a journal next to the output directory, which is removed when the run is
+        complete (see _functions.checkpoint)
+    max_bytes: int
+        The maximum total size of the large pdf files that are unlocked at the same time, so a few very large
+        files do not use up the memory (see uf.run_jobs)
+    pool: WorkerPool
+        A pool of worker processes that is kept after this run, e.g. in watch mode (see uf.run_jobs)
+    archive: str
+        Write the unlocked files into this zip or tar file (.zip, .tar, .tar.gz) instead of the output directory,
+        dst is not used. The files pass through a local staging folder (see _functions.archive_output), so
+        incremental and resume are not used
+    profile: str
+        The save profile of the resave step, 'fast' (default) or a profile that makes the files smaller or web
+        optimized at the cost of cpu time (see uf.SAVE_PROFILES)
+    read_ahead: int
+        The maximum total size of the pdf files read ahead of the worker processes, for a folder on a slow share
+        (see uf.iter_unlock), 0 is off
+    scratch_dir: str
+        A local folder the unlocked files are saved in before they are moved to the output directory in the
+        background (see uf.iter_unlock)
+    timeout: float
+        The maximum seconds for one pdf file. The worker process is killed and replaced and the file is
+        quarantined, so one malformed file does not stall the run (see uf.run_jobs)
+    max_rss: int
+        The maximum resident memory in bytes of a worker process, enforced like timeout
+
+    Returns
+    -------
+    summary: dict
+        The process and output directory, the number of pdf files found and unlocked, the total bytes in and out
+        of the unlocked files (without duplicates), the files that failed, the quarantined files and why,
+        in incremental mode the number of cache hits and misses and the pruned files and in dedup mode the
+        number of duplicates and the bytes and (estimated) seconds saved, with resume the number of files
+        unlocked by the previous run and the number of files per category (see _functions.classify_pdf)
+    """
+
+    options = dict(workers=workers, progress=progress, stream=stream, non_pdf=non_pdf, incremental=incremental,
+                   use_hash=use_hash, prune=prune, dedup=dedup, fast_path=fast_path, on_metrics=on_metrics,
+                   resume=resume, max_bytes=max_bytes, pool=pool, profile=profile, read_ahead=read_ahead,
+                   scratch_dir=scratch_dir, timeout=timeout, max_rss=max_rss)
+    if not archive:
+        return _unlock_tree(src, dst, **options)
+
+    writer = ao.ArchiveWriter(archive)
+    options.update(incremental=False, resume=False)
+    try:
+        summary = _unlock_tree(src, writer.staging_dir, writer=writer, **options)
+    except BaseException:
+        # no archive that looks complete but is not
+        writer.abort()
+        raise
+    writer.close()
+    summary['out_dir'] = writer.path
+    return summary
+
+
+def _unlock_tree(src, dst, workers=None, progress=None, stream=False, non_pdf='skip', incremental=False,
+                 use_hash=False, prune=False, dedup=False, fast_path=True, on_metrics=None, resume=False,
+                 max_bytes=uf.MAX_IN_FLIGHT_BYTES, pool=None, profile=uf.DEFAULT_PROFILE, read_ahead=0,
+                 scratch_dir=None, timeout=None, max_rss=None, writer=None):
+    """
+    Runs the whole tool on a folder or zip file (see unlock_tree). With a writer (see _functions.archive_output) dst
+    is its staging folder and every unlocked file is moved into the archive.
+    """
+
+    src = os.path.abspath(src)
+    if stream and os.path.isfile(src) and src.lower().endswith('.zip'):
+        process_dir = os.path.abspath(os.path.splitext(src)[0])
+        out_dir = os.path.abspath(dst) if dst else default_out_dir(process_dir)
+        logging.info(f'Zip_dir: {src}')
+        logging.info(f'Output directory: {out_dir}')
+        journal = ck.open_journal(out_dir, resume=resume)
+        with mt.timed_stage(on_metrics, 'unlock'):
+            pdf_files, unlocked_pdfs, failed, categories, sizes, quarantined = unlock_zip(
+                src, out_dir, workers=workers, non_pdf=non_pdf, progress=progress, fast_path=fast_path,
+                on_metrics=on_metrics, journal=journal, max_bytes=max_bytes, pool=pool, writer=writer,
+                profile=profile, timeout=timeout, max_rss=max_rss)
+        journal.close(remove=True)
+        if writer is not None:
+            # the directories and the copied files that are not pdf files
+            writer.add_tree(out_dir)
+        return {'process_dir': None,
+                'out_dir': out_dir,
+                'pdf_files': pdf_files,
+                'unlocked_pdfs': unlocked_pdfs,
+                'failed': failed,
+                'quarantined': quarantined,
+                'categories': categories,
+                'bytes_in': sizes['bytes_in'],
+                'bytes_out': sizes['bytes_out']}
+
+    if os.path.isfile(src) and src.lower().endswith('.zip'):
+        process_dir = os.path.abspath(os.path.splitext(src)[0])
+        out_dir = os.path.abspath(dst) if dst else default_out_dir(process_dir)
+        journal = ck.open_journal(out_dir, resume=resume)
+        logging.info(f'Zip_dir: {src}')
+        logging.info(f'Process directory: {process_dir}')
+        with mt.timed_stage(on_metrics, 'unzip'):
+            uz.unzip_files(src, process_dir, on_metrics=on_metrics, journal=journal)
+        with mt.timed_stage(on_metrics, 'scan'):
+            manifest = sf.scan_files(process_dir)
+    else:
+        process_dir = src
+        out_dir = os.path.abspath(dst) if dst else default_out_dir(process_dir)
+        journal = ck.open_journal(out_dir, resume=resume)
+        logging.info(f'Process directory: {process_dir}')
+        with mt.timed_stage(on_metrics, 'rename'):
+            manifest = prepare_folder(process_dir, on_metrics=on_metrics, journal=journal)
+
+    files_to_unlock, empty_dir = find_pdf_files(manifest)
+    logging.info(f'Output directory: {out_dir}')
+
+    summary = {'process_dir': process_dir,
+               'out_dir': out_dir,
+               'pdf_files': len(files_to_unlock)}
+
+    resumed = set()
+    if resume:
+        resumed = {file for file in files_to_unlock
+                   if journal.is_done(ck.UNLOCK, file, file.replace(process_dir, out_dir))}
+        files_to_unlock = [file for file in files_to_unlock if file not in resumed]
+        logging.info(f'Skipped {len(resumed)} pdf files unlocked in a previous run')
+        summary['resumed'] = len(resumed)
+
+    entries = {entry.path: entry for entry in manifest.of_kind(sf.PDF)}
+    cache = None
+    if incremental:
+        cache = uc.UnlockCache(uc.cache_path(out_dir), process_dir, use_hash=use_hash)
+        if prune:
+            # all pdf files in the folder, also the ones a resumed run finished before
+            summary['pruned'] = cache.prune(manifest.pdf_files)
+        for file in resumed:
+            cache.update(file, entries[file].size, entries[file].mtime, file.replace(process_dir, out_dir))
+        files_to_unlock = [file for file in files_to_unlock
+                           if not cache.is_up_to_date(file, entries[file].size, entries[file].mtime,
+                                                      file.replace(process_dir, out_dir))]
+        logging.info(f'Cache hits: {cache.hits}, cache misses: {cache.misses}')
+        summary['cache_hits'] = cache.hits
+        summary['cache_misses'] = cache.misses
+
+    total = len(files_to_unlock)
+    duplicates = {}
+    if dedup:
+        files_to_unlock, duplicates = dd.group_duplicates(files_to_unlock,
+                                                          {file: entries[file].size for file in files_to_unlock})
+        summary['duplicates'] = total - len(files_to_unlock)
+        summary['dedup_bytes_saved'] = sum(entries[file].size for copies in duplicates.values() for file in copies)
+        summary['dedup_seconds_saved'] = 0.0
+
+    def moved(result, copies):
+        # returns the files that could not be added to the archive. The duplicates are placed from
+        # result.file_out, so it is moved into the archive last
+        not_added = [file for file in copies
+                     if file not in failed and not writer.move_file(file.replace(process_dir, out_dir))]
+        if not writer.move_file(result.file_out):
+            not_added.append(result.file)
+        return not_added
+
+    def unlocked(file, file_out):
+        nonlocal unlocked_pdfs
+        unlocked_pdfs += 1
+        journal.record(ck.UNLOCK, file, file_out)
+        if cache is not None:
+            entry = entries[file]
+            cache.update(file, entry.size, entry.mtime, file_out)
+
+    logging.info('Started unlocking PDF files')
+    failed = []
+    unlocked_pdfs = len(resumed)
+    done = 0
+    categories = {}
+    sizes = {'bytes_in': 0, 'bytes_out': 0}
+    quarantined = []
+    with mt.timed_stage(on_metrics, 'unlock'):
+        for result in uf.iter_unlock(files_to_unlock=files_to_unlock, process_dir=process_dir,
+                                     out_dir=out_dir, workers=workers, max_bytes=max_bytes,
+                                     sizes={file: entries[file].size for file in files_to_unlock},
+                                     pool=pool, read_ahead=read_ahead, scratch_dir=scratch_dir,
+                                     timeout=timeout, max_rss=max_rss, fast_path=fast_path, profile=profile):
+            if on_metrics is not None:
+                on_metrics(mt.unlock_record(result))
+            copies = duplicates.get(result.file, [])
+            if result.category is not None:
+                categories[result.category] = categories.get(result.category, 0) + 1 + len(copies)
+            if result.unlocked:
+                unlocked(result.file, result.file_out)
+                add_sizes(sizes, result)
+                for file in copies:
+                    file_out = file.replace(process_dir, out_dir)
+                    if dd.place_duplicate(result.file_out, file_out):
+                        unlocked(file, file_out)
+                        summary['dedup_seconds_saved'] += result.seconds
+                    else:
+                        failed.append(file)
+                if writer is not None:
+                    for file in moved(result, copies):
+                        unlocked_pdfs -= 1
+                        failed.append(file)
+            else:
+                failed.append(result.file)
+                failed.extend(copies)
+                if result.category == wd.QUARANTINED:
+                    quarantined.append((result.file, result.error))
+            done += 1 + len(copies)
+            if progress is not None:
+                progress(done, total)
+    logging.info('Finished unlocking PDF files')
+    if cache is not None:
+        cache.save()
+
+    with mt.timed_stage(on_metrics, 'empty_dirs'):
+        if writer is not None:
+            for emp_dir in empty_dir:
+                writer.add_dir(os.path.relpath(emp_dir, process_dir))
+        else:
+            create_empty_dirs(empty_dir, process_dir, out_dir)
+    journal.close(remove=True)
+
+    summary['unlocked_pdfs'] = unlocked_pdfs
+    summary['failed'] = failed
+    summary['quarantined'] = quarantined
+    summary['categories'] = categories
+    summary.update(sizes)
+    return summary
+
+
+def publish_tree(src, dst=None, queue=None, batch_size=wq.BATCH_SIZE, on_metrics=None):
+    """
+    Prepares a folder or zip file like unlock_tree (unzip, rename, find) and publishes the pdf files in a work
+    queue instead of unlocking them, so workers on several machines can unlock them (see _functions.work_queue).
+    The empty directories are made in the output directory here.
+
+    Parameters
+    ----------
+    src: str
+        The path to the folder or zip file with pdf files, on a share the workers can reach
+    dst: str
+        The output directory, default is the folder (or zip file name) followed by _unlocked
+    queue: str
+        The queue file, default is the output directory followed by _queue.sqlite
+    batch_size: int
+        The number of pdf files a worker claims at once
+    on_metrics: callable
+        Called with a metrics record (see _functions.metrics) for every file and stage
+
+    Returns
+    -------
+    summary: dict
+        The process and output directory, the queue file and the number of pdf files found and batches published
+    """
+
+    src = os.path.abspath(src)
+    if os.path.isfile(src) and src.lower().endswith('.zip'):
+        process_dir = os.path.abspath(os.path.splitext(src)[0])
+        with mt.timed_stage(on_metrics, 'unzip'):
+            uz.unzip_files(src, process_dir, on_metrics=on_metrics)
+        with mt.timed_stage(on_metrics, 'scan'):
+            manifest = sf.scan_files(process_dir)
+    else:
+        process_dir = src
+        with mt.timed_stage(on_metrics, 'rename'):
+            manifest = prepare_folder(process_dir, on_metrics=on_metrics)
+    out_dir = os.path.abspath(dst) if dst else default_out_dir(process_dir)
+    queue = os.path.abspath(queue) if queue else wq.queue_path(out_dir)
+    logging.info(f'Process directory: {process_dir}')
+    logging.info(f'Output directory: {out_dir}')
+
+    files_to_unlock, empty_dir = find_pdf_files(manifest)
+    with mt.timed_stage(on_metrics, 'empty_dirs'):
+        create_empty_dirs(empty_dir, process_dir, out_dir)
+    work_queue = wq.WorkQueue(queue)
+    try:
+        batches = work_queue.publish(process_dir, out_dir, files_to_unlock,
+                                     sizes={entry.path: entry.size for entry in manifest.of_kind(sf.PDF)},
+                                     batch_size=batch_size)
+    finally:
+        work_queue.close()
+
+    return {'process_dir': process_dir,
+            'out_dir': out_dir,
+            'queue': queue,
+            'pdf_files': len(files_to_unlock),
+            'batches': batches}
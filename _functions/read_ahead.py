@@ -0,0 +1,153 @@
+import collections
+import concurrent.futures
+import logging
+import os
+import shutil
+from pathlib import Path
+import _functions.checkpoint as ck
+
+"""
+    This file is called from the file _functions.unlock_file.py. It overlaps the network I/O of the unlock step with
+    the work of the worker processes, for pdf files on a slow (SMB/NFS) share: a few threads read the next files
+    into memory while the workers unlock the files before them, and the workers save on a local scratch folder from
+    which threads move the finished files to the output directory in the background.
+"""
+
+
+# Maximum total size of the files read ahead and not yet handed to the workers
+READ_AHEAD_BYTES = 256 * 1024 * 1024
+# Number of threads reading files ahead and writing files back
+READ_THREADS = 4
+WRITE_THREADS = 2
+# Maximum number of jobs looked at ahead of the workers (also the ones that are not read, e.g. large files)
+MAX_AHEAD = 1024
+
+
+def read_file(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def read_ahead(jobs, sizes, max_bytes=READ_AHEAD_BYTES, max_size=None, threads=READ_THREADS):
+    """
+    Reads the source files of jobs ahead on a pool of threads and yields the jobs in the same order with the
+    content of the file as source (see uf.resave_pdf). Reading stops while the files read and not yet yielded are
+    max_bytes together. A file that cannot be read, or is larger than max_size or max_bytes, is yielded with its
+    path as source, so the worker opens it itself.
+
+    Parameters
+    ----------
+    jobs: iterable
+        Tuples with the arguments of resave_pdf: (source, file, file_out), source is the path to the pdf file
+    sizes: callable
+        Returns the size of a pdf file
+    max_bytes: int
+        The maximum total size of the files read ahead
+    max_size: int
+        Files of this size and larger are not read ahead (e.g. uf.LARGE_FILE_SIZE, they are memory mapped)
+    threads: int
+        The number of reading threads
+
+    Yields
+    ------
+    job: tuple
+        The job, with the content of the file as source if it was read ahead
+    """
+
+    jobs = iter(jobs)
+    ahead = collections.deque()  # (future or None, job, size)
+    in_memory = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        try:
+            while True:
+                while jobs is not None and len(ahead) < MAX_AHEAD and (not ahead or in_memory < max_bytes):
+                    job = next(jobs, None)
+                    if job is None:
+                        jobs = None
+                        break
+                    size = sizes(job[0])
+                    if size > max_bytes or (max_size is not None and size >= max_size):
+                        ahead.append((None, job, 0))
+                        continue
+                    ahead.append((executor.submit(read_file, job[0]), job, size))
+                    in_memory += size
+                if not ahead:
+                    return
+                future, job, size = ahead.popleft()
+                in_memory -= size
+                if future is None:
+                    yield job
+                    continue
+                try:
+                    data = future.result()
+                except OSError:
+                    logging.debug('Failed to read ahead: %s', job[0])
+                    yield job
+                    continue
+                yield (data,) + tuple(job[1:])
+        finally:
+            for future, job, size in ahead:
+                if future is not None:
+                    future.cancel()
+
+
+def move_file(file, file_out):
+    """
+    Moves a finished file from the scratch folder to its place in the output directory, through a temporary file
+    so no half written file is left in the output directory.
+    """
+
+    Path(os.path.dirname(file_out)).mkdir(parents=True, exist_ok=True)
+    try:
+        shutil.move(file, ck.temp_path(file_out))
+        ck.replace_temp(file_out)
+    except:
+        ck.remove_temp(file_out)
+        raise
+
+
+def write_back(results, scratch_dir, outputs, threads=WRITE_THREADS):
+    """
+    Moves the files the workers saved in the scratch folder to the output directory on a pool of threads and
+    yields the results with the final output path when the file is in place (in the order the moves finish). The
+    scratch folder is removed at the end.
+
+    Parameters
+    ----------
+    results: iterable
+        The UnlockResult of every file (see uf.run_jobs), file_out is the path in the scratch folder
+    scratch_dir: str
+        The scratch folder of this run
+    outputs: dict
+        The path in the output directory of every path in the scratch folder
+
+    Yields
+    ------
+    result: UnlockResult
+        The result with the path in the output directory, not unlocked if the file could not be moved
+    """
+
+    def moved(future):
+        result = moving.pop(future)
+        file_out = outputs[result.file_out]
+        try:
+            future.result()
+        except Exception as e:
+            logging.error(f'Failed to write back unlocked file: {file_out}')
+            return result._replace(file_out=file_out, unlocked=False, error=repr(e))
+        return result._replace(file_out=file_out)
+
+    moving = {}
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+            for result in results:
+                if not result.unlocked:
+                    yield result._replace(file_out=outputs.get(result.file_out, result.file_out))
+                else:
+                    moving[executor.submit(move_file, result.file_out, outputs[result.file_out])] = result
+                for future in [future for future in moving if future.done()]:
+                    yield moved(future)
+            for future in concurrent.futures.as_completed(list(moving)):
+                yield moved(future)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
@@ -0,0 +1,110 @@
+import logging
+import os
+from collections import namedtuple
+import _functions.check_length as cl
+
+"""
+    This file is called from the file _functions.pipeline.py. It is used to go through the selected folder once and
+    keep what is found (pdf files, zip files, empty directories, too long names) for the other steps of the tool.
+"""
+
+
+ScanEntry = namedtuple('ScanEntry', ['path', 'size', 'mtime', 'kind', 'long_name'])
+
+PDF = 'pdf'
+ZIP = 'zip'
+EMPTY_DIR = 'empty_dir'
+OTHER = 'other'
+
+
+class Manifest:
+    """
+    The files and empty directories found in a folder.
+
+    Attributes
+    ----------
+    top: str
+        The scanned folder
+    entries: list
+        A ScanEntry (path, size, mtime, kind, long_name) for every file and empty directory
+    """
+
+    def __init__(self, top, entries=None):
+        self.top = top
+        self.entries = entries if entries is not None else []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def of_kind(self, kind):
+        """
+        Returns the entries of one kind (PDF, ZIP, EMPTY_DIR or OTHER).
+        """
+
+        return [entry for entry in self.entries if entry.kind == kind]
+
+    @property
+    def pdf_files(self):
+        return [entry.path for entry in self.entries if entry.kind == PDF]
+
+    @property
+    def empty_dirs(self):
+        return [entry.path for entry in self.entries if entry.kind == EMPTY_DIR]
+
+
+def classify(name):
+    """
+    Returns the kind of a file based on its name: PDF, ZIP or OTHER.
+    """
+
+    name_lower = name.lower()
+    if name_lower.endswith('.pdf'):
+        return PDF
+    if name_lower.endswith('.zip'):
+        return ZIP
+    return OTHER
+
+
+def scan_files(top):
+    """
+    Goes through a folder and its subfolders once with os.scandir.
+
+    Parameters
+    ----------
+    top: str
+        The folder to scan
+
+    Returns
+    -------
+    manifest: Manifest
+        The files and empty directories found
+    """
+
+    logging.info(f'Scanning folder: {top}')
+    manifest = Manifest(top)
+    to_scan = [top]
+    while to_scan:
+        directory = to_scan.pop()
+        empty = True
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    empty = False
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            to_scan.append(entry.path)
+                            continue
+                        stat = entry.stat()
+                    except OSError:
+                        logging.error(f'Failed to read: {entry.path}')
+                        continue
+                    manifest.entries.append(ScanEntry(entry.path, stat.st_size, stat.st_mtime, classify(entry.name),
+                                                      len(entry.path) > cl.MAX_LENGTH))
+        except OSError:
+            logging.error(f'Failed to scan folder: {directory}')
+            continue
+        if empty:
+            manifest.entries.append(ScanEntry(directory, 0, 0, EMPTY_DIR, False))
+    logging.info(f'Found {len(manifest)} files and empty directories')
+
+    return manifest
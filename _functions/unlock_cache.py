@@ -0,0 +1,169 @@
+import hashlib
+import json
+import logging
+import os
+
+"""
+    This file is called from the file _functions.pipeline.py. It keeps a record of the unlocked files of a previous run
+    (next to the output directory), so a new run on the same folder only unlocks new and changed files.
+"""
+
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path):
+    """
+    Returns the sha256 hex digest of a file, read in chunks so large files are not loaded in memory.
+
+    Parameters
+    ----------
+    path: str
+        The path to the file
+    """
+
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def cache_path(out_dir):
+    """
+    Returns the path of the cache file of an output directory: <out_dir>_cache.jsonl
+    """
+
+    return os.path.join(os.path.dirname(out_dir), os.path.basename(out_dir) + '_cache.jsonl')
+
+
+class UnlockCache:
+    """
+    The files unlocked in previous runs, stored as json lines with the source path (relative to the process
+    directory), size, modification time, optional sha256 and output path.
+
+    A file is up to date if its output exists and its size and modification time did not change. When use_hash is
+    True a file with a changed size or modification time is still up to date if its content hash is the same
+    (e.g. a zip file that was unzipped again).
+
+    Attributes
+    ----------
+    path: str
+        The cache file
+    hits: int
+        The number of files that were up to date
+    misses: int
+        The number of new or changed files
+    """
+
+    def __init__(self, path, process_dir, use_hash=False):
+        self.path = path
+        self.process_dir = process_dir
+        self.use_hash = use_hash
+        self.hits = 0
+        self.misses = 0
+        self.records = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    for line in file:
+                        record = json.loads(line)
+                        self.records[record['source']] = record
+                logging.info(f'Loaded {len(self.records)} records from cache: {path}')
+            except:
+                logging.error(f'Failed to read cache, unlocking all files: {path}')
+                self.records = {}
+
+    def key(self, file):
+        return os.path.relpath(file, self.process_dir)
+
+    def is_up_to_date(self, file, size, mtime, file_out):
+        """
+        Checks if a file was already unlocked and counts the hit or miss.
+
+        Parameters
+        ----------
+        file: str
+            The path to the pdf file
+        size: int
+            The size of the pdf file
+        mtime: float
+            The modification time of the pdf file
+        file_out: str
+            The path to the unlocked file
+        """
+
+        record = self.records.get(self.key(file))
+        up_to_date = False
+        if record is not None and record['file_out'] == file_out and os.path.exists(file_out):
+            if record['size'] == size and record['mtime'] == mtime:
+                up_to_date = True
+            elif self.use_hash and record.get('sha256') and record['size'] == size:
+                try:
+                    up_to_date = hash_file(file) == record['sha256']
+                except OSError:
+                    up_to_date = False
+                if up_to_date:
+                    record['mtime'] = mtime
+        if up_to_date:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return up_to_date
+
+    def update(self, file, size, mtime, file_out):
+        """
+        Records a file that has been unlocked.
+        """
+
+        record = {'source': self.key(file), 'size': size, 'mtime': mtime, 'file_out': file_out}
+        if self.use_hash:
+            try:
+                record['sha256'] = hash_file(file)
+            except OSError:
+                logging.error(f'Failed to hash file: {file}')
+        self.records[record['source']] = record
+
+    def prune(self, files):
+        """
+        Removes the outputs (and records) of files that are no longer in the process directory.
+
+        Parameters
+        ----------
+        files: list
+            The pdf files currently in the process directory
+
+        Returns
+        -------
+        pruned: list
+            The removed output files
+        """
+
+        current = {self.key(file) for file in files}
+        pruned = []
+        for source in [source for source in self.records if source not in current]:
+            file_out = self.records.pop(source)['file_out']
+            try:
+                os.remove(file_out)
+                logging.debug('Removed output of deleted file: %s', file_out)
+                pruned.append(file_out)
+            except FileNotFoundError:
+                pass
+            except:
+                logging.error(f'Failed to remove output of deleted file: {file_out}')
+        return pruned
+
+    def save(self):
+        """
+        Writes the cache file (to a temporary file first, so an interrupted run never leaves a broken cache).
+        """
+
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                for record in self.records.values():
+                    file.write(json.dumps(record) + '\n')
+            os.replace(temp_path, self.path)
+            logging.info(f'Saved {len(self.records)} records to cache: {self.path}')
+        except:
+            logging.error(f'Failed to save cache: {self.path}')
@@ -1,12 +1,23 @@
+import collections
+import concurrent.futures
+import io
 import logging
 import os
-import pikepdf
-from pikepdf import _cpphelpers #uncomment in py file when making exe with pyinstaller
-import subprocess
+import queue
+import shutil
+import signal
 import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-import tkinter as tk
-from tkinter import ttk
+import _functions.checkpoint as ck
+import _functions.classify_pdf as cp
+import _functions.log_config as lc
+import _functions.metrics as mt
+import _functions.read_ahead as ra
+import _functions.watchdog as wd
 
 """
     This file is called from the main file PDF_unlock_tool.py. It is used to unlock pdf files and save status in a log file.
@@ -14,15 +25,676 @@ from tkinter import ttk
     Author: Joana Cardoso
 """
 
-logging.basicConfig(level=logging.DEBUG,
-                    format='%(asctime)s %(levelname)s %(funcName)s %(message)s',
-                    filename='Logging_UnlockTool.log'
-                    )  # to see log in console remove filename
 
+UnlockResult = namedtuple('UnlockResult', ['file', 'file_out', 'unlocked', 'error', 'seconds', 'category', 'metrics'],
+                          defaults=[0.0, None, None])
 
-def unlock_pdf(files_to_unlock, process_dir, out_dir):
+# Number of attempts for a file whose worker process died while handling it
+MAX_ATTEMPTS = 2
+
+# Milliseconds between two updates of the progress bar
+POLL_MS = 100
+
+# Pdf files of this size and larger are opened memory mapped and saved without decoding their streams, and count
+# against MAX_IN_FLIGHT_BYTES: the large files handled at the same time may not be larger than that together
+LARGE_FILE_SIZE = 256 * 1024 * 1024
+MAX_IN_FLIGHT_BYTES = 1024 * 1024 * 1024
+
+# Pdf files smaller than SMALL_FILE_SIZE are sent to the worker processes in batches of at most BATCH_SIZE files
+# and BATCH_BYTES bytes
+SMALL_FILE_SIZE = 256 * 1024
+BATCH_SIZE = 32
+BATCH_BYTES = 4 * 1024 * 1024
+
+# Save profiles of the resave step, from fast to small (see save_options). 'fast' saves with the pikepdf defaults,
+# the others trade cpu time for smaller or web optimized files:
+#   object_streams: 'preserve' keeps the object streams of the input, 'generate' packs all objects in object streams
+#   recompress_flate: decompress and compress the flate streams again at the highest level
+#   linearize: fast web view, the first page can be shown before the whole file is downloaded
+#   remove_unreferenced: drop fonts, images, etc. that no page uses
+SAVE_PROFILES = {
+    'fast': {},
+    'compact': {'object_streams': 'generate', 'recompress_flate': True, 'remove_unreferenced': True},
+    'web': {'object_streams': 'preserve', 'linearize': True},
+    'compact-web': {'object_streams': 'generate', 'recompress_flate': True, 'remove_unreferenced': True,
+                    'linearize': True},
+}
+DEFAULT_PROFILE = 'fast'
+
+
+def unlock_file(file, process_dir, out_dir):
+    """
+    Unlocks a single pdf file found in the process directory.
+
+    Parameters
+    ----------
+    file: str
+        The path to the pdf file
+    process_dir: str
+        The directory of the selected folder
+    out_dir: str
+        The output directory where the converted file will be placed
+
+    Returns
+    -------
+    result: UnlockResult
+        The input and output path, whether the file was unlocked and the error message if it was not
+    """
+
+    return resave_pdf(file, file, file.replace(process_dir, out_dir))
+
+
+def resave_pdf(source, file, file_out, fast_path=True, profile=DEFAULT_PROFILE):
+    """
+    Opens a pdf with pikepdf, deletes the metadata and saves it. This is the unit of work of the (parallel)
+    unlocking engine and must not raise, so a failure in one file never affects the others.
+    With fast_path, pdf files that are not encrypted and have no metadata are copied instead of resaved (only with
+    the fast profile, the other profiles resave every file to make it smaller).
+
+    Parameters
+    ----------
+    source: str or bytes
+        The path to the pdf file or its content (e.g. read from a zip file)
+    file: str
+        The name of the pdf file used in the log and the result
+    file_out: str
+        The path where the converted file will be placed
+    fast_path: bool
+        Check the file with _functions.classify_pdf first and copy it if there is nothing to unlock
+    profile: str
+        The save profile, a key of SAVE_PROFILES
+
+    Returns
+    -------
+    result: UnlockResult
+        The input and output path, whether the file was unlocked, the error message if it was not, the
+        time it took, the category of the file (see _functions.classify_pdf) and the metrics: the seconds per
+        step (classify, copy, open, strip, save), bytes in and out, the number of pages and the save profile
+    """
+
+    start = time.perf_counter()
+    metrics = {'bytes_in': source_size(source)}
+
+    def result(unlocked, error=None, category=None):
+        try:
+            metrics['bytes_out'] = os.path.getsize(file_out) if unlocked else 0
+        except OSError:
+            pass
+        return UnlockResult(file, file_out, unlocked, error, time.perf_counter() - start, category, metrics)
+
+    # create output directory/subdirectory
+    logging.debug('file_out: %s', file_out)
+    root_dir = os.path.dirname(file_out)
+    try:
+        Path(root_dir).mkdir(parents=True, exist_ok=True)  ## Create output dir
+        logging.debug('Creating output directory: %s', root_dir)
+    except:
+        logging.error(f'Failed to create output directory: {root_dir}')
+
+    if fast_path and profile == DEFAULT_PROFILE:
+        step = time.perf_counter()
+        if isinstance(source, bytes):
+            category = cp.classify_buffer(source)
+        else:
+            category = cp.classify_pdf(source)
+        metrics['classify'] = time.perf_counter() - step
+        if category == cp.PLAIN:
+            step = time.perf_counter()
+            try:
+                if isinstance(source, bytes):
+                    with open(ck.temp_path(file_out), 'wb') as output:
+                        output.write(source)
+                else:
+                    shutil.copyfile(source, ck.temp_path(file_out))
+                ck.replace_temp(file_out)
+                metrics['copy'] = time.perf_counter() - step
+                logging.debug('Copy PDF file without protection: %s', file_out)
+                return result(True, category=cp.PLAIN)
+            except Exception:
+                ck.remove_temp(file_out)
+                logging.error(f'Failed to copy PDF file: {file_out}')  # try resaving it
+
+    # Open pdf and save with pikepdf to get rid of any write protections
+    # The input file is only read, the output is written to a temporary file that is renamed into place
+    pikepdf = import_pikepdf()
+    pdf_source = io.BytesIO(source) if isinstance(source, bytes) else source
+    open_options, save_options = pikepdf_options(source, metrics['bytes_in'])
+    save_options, remove_unreferenced = save_profile(profile, save_options)
+    metrics['profile'] = profile
+    try:
+        step = time.perf_counter()
+        with pikepdf.open(pdf_source, **open_options) as pdf:
+            metrics['open'] = time.perf_counter() - step
+            metrics['pages'] = len(pdf.pages)
+            category = cp.RESTRICTED if pdf.is_encrypted else cp.RESAVED
+            step = time.perf_counter()
+            if 'Metadata' in pdf.Root.keys():  # if PDF metadata is present, delete it
+                try:
+                    del pdf.Root.Metadata
+                    logging.debug('Deleting metadata from file: %s', file)
+                except:
+                    logging.error(
+                        f'Failed to delete metadata from file: {file}')
+            if remove_unreferenced:
+                pdf.remove_unreferenced_resources()
+            metrics['strip'] = time.perf_counter() - step
+            step = time.perf_counter()
+            pdf.save(ck.temp_path(file_out), **save_options)  # Save processed pdf
+            metrics['save'] = time.perf_counter() - step
+        ck.replace_temp(file_out)
+        logging.debug('Resave PDF file: %s', file_out)
+    except pikepdf.PasswordError as e:
+        logging.error(f'PDF file needs a password to be opened: {file}')
+        return result(False, repr(e), cp.ENCRYPTED)
+    except Exception as e:
+        ck.remove_temp(file_out)
+        logging.error(f'Failed to resave PDF file: {file_out}')
+        return result(False, repr(e))
+
+    return result(True, category=category)
+
+
+def import_pikepdf():
+    """
+    Imports pikepdf when the first pdf is resaved, so starting the tool (and copying pdf files on the fast path)
+    does not wait for pikepdf and qpdf to load. Python keeps the module after the first import.
+    """
+
+    import pikepdf
+    from pikepdf import _cpphelpers  # uncomment in py file when making exe with pyinstaller
+    return pikepdf
+
+
+def source_size(source):
+    """
+    Returns the size in bytes of a pdf file, its content or a source that is read later (see read_job), 0 if the
+    file cannot be read.
+    """
+
+    if isinstance(source, bytes):
+        return len(source)
+    if hasattr(source, 'read'):
+        return source.size
+    try:
+        return os.path.getsize(source)
+    except OSError:
+        return 0
+
+
+def pikepdf_options(source, size):
+    """
+    Chooses the options of pikepdf.open and Pdf.save for a pdf file by its size. Files smaller than LARGE_FILE_SIZE
+    use the defaults. Large files are memory mapped, so only the parts qpdf reads are loaded (and the os can drop
+    them again), and their streams are copied to the output as they are instead of decoded and compressed again.
+
+    Parameters
+    ----------
+    source: str or bytes
+        The path to the pdf file or its content, content is already in memory and is never memory mapped
+    size: int
+        The size of the pdf file
+
+    Returns
+    -------
+    open_options: dict
+        Keyword arguments for pikepdf.open
+    save_options: dict
+        Keyword arguments for Pdf.save
+    """
+
+    if size < LARGE_FILE_SIZE:
+        return {}, {}
+    pikepdf = import_pikepdf()
+    open_options = {} if isinstance(source, bytes) else {'access_mode': pikepdf.AccessMode.mmap}
+    return open_options, {'stream_decode_level': pikepdf.StreamDecodeLevel.none}
+
+
+def save_profile(profile, save_options):
+    """
+    Adds the options of a save profile (see SAVE_PROFILES) to the Pdf.save options of a file. Streams of large
+    files are not decoded (see pikepdf_options), so they are not recompressed either.
+
+    Parameters
+    ----------
+    profile: str
+        The save profile, a key of SAVE_PROFILES
+    save_options: dict
+        Keyword arguments for Pdf.save by the size of the file
+
+    Returns
+    -------
+    save_options: dict
+        Keyword arguments for Pdf.save
+    remove_unreferenced: bool
+        Remove the unreferenced resources of every page before saving
+    """
+
+    settings = SAVE_PROFILES[profile]
+    if not settings:
+        return save_options, False
+    pikepdf = import_pikepdf()
+    save_options = dict(save_options)
+    if 'object_streams' in settings:
+        save_options['object_stream_mode'] = getattr(pikepdf.ObjectStreamMode, settings['object_streams'])
+    if settings.get('recompress_flate') and 'stream_decode_level' not in save_options:
+        save_options['recompress_flate'] = True
+        save_options['compress_streams'] = True
+    if settings.get('linearize'):
+        save_options['linearize'] = True
+    return save_options, settings.get('remove_unreferenced', False)
+
+
+def iter_unlock(files_to_unlock, process_dir, out_dir, workers=None, cancel=None, max_bytes=MAX_IN_FLIGHT_BYTES,
+                sizes=None, largest_first=True, batch_bytes=BATCH_BYTES, pool=None, read_ahead=0, scratch_dir=None,
+                **options):
+    """
+    Unlocks pdf files, spreading the work over a pool of worker processes, and yields the results
+    as the files are finished (not necessarily in input order). The largest files are started first, so the
+    batch does not end with one worker busy on a large file while the others wait; the small files at the end
+    fill up the workers.
+
+    Parameters
+    ----------
+    files_to_unlock: list
+        The pdf files found in the origin(process) directory
+    process_dir: str
+        The directory of the selected folder
+    out_dir: str
+        The output directory where converted files will be placed
+    workers: int
+        The number of worker processes, default is the number of cpu's. With 1 worker the files are
+        unlocked one after another in the calling process
+    cancel: threading.Event
+        When set, no new files are started; the files being unlocked are finished (see run_jobs)
+    max_bytes: int
+        The maximum total size of the large files that are unlocked at the same time (see run_jobs)
+    sizes: dict
+        The size of every file (e.g. from the Manifest), default is to look them up
+    largest_first: bool
+        Unlock the files from large to small, False keeps the order of files_to_unlock
+    batch_bytes: int
+        The maximum total size of a batch of small files (see run_jobs)
+    pool: WorkerPool
+        A pool of worker processes that is kept after these files (see run_jobs)
+    read_ahead: int
+        The maximum total size of the files read into memory ahead of the workers by threads of this process, 0
+        lets every worker read its own files. For files on a slow share (see _functions.read_ahead)
+    scratch_dir: str
+        A local folder the workers save the unlocked files in, threads move them to out_dir in the background.
+        Default is to save in out_dir directly
+    options:
+        Keyword arguments passed on to run_jobs (e.g. timeout, max_rss) and resave_pdf (e.g. fast_path)
+
+    Yields
+    ------
+    result: UnlockResult
+        The result of every file in files_to_unlock
+    """
+
+    if largest_first:
+        if sizes is None:
+            sizes = {file: source_size(file) for file in files_to_unlock}
+        files_to_unlock = sorted(files_to_unlock, key=lambda file: sizes.get(file, 0), reverse=True)
+    save_dir = out_dir
+    if scratch_dir is not None:
+        Path(scratch_dir).mkdir(parents=True, exist_ok=True)
+        save_dir = tempfile.mkdtemp(prefix='pdf_unlock_', dir=scratch_dir)
+        outputs = {file.replace(process_dir, save_dir): file.replace(process_dir, out_dir) for file in files_to_unlock}
+    jobs = ((file, file, file.replace(process_dir, save_dir)) for file in files_to_unlock)
+    if read_ahead:
+        known = sizes or {}
+        jobs = ra.read_ahead(jobs, lambda file: known[file] if file in known else source_size(file),
+                             max_bytes=read_ahead, max_size=LARGE_FILE_SIZE)
+    if len(files_to_unlock) < 2:
+        workers = 1
+    results = run_jobs(jobs, workers=workers, cancel=cancel, max_bytes=max_bytes, batch_bytes=batch_bytes, pool=pool,
+                       **options)
+    if scratch_dir is not None:
+        results = ra.write_back(results, save_dir, outputs)
+    return results
+
+
+def read_job(job):
+    """
+    Reads the source of a job that is read when it is sent to a worker (an object with read() and size, e.g. a
+    uz.ZipMember) and returns the job with the content as source. Other jobs are returned as they are.
+    """
+
+    if hasattr(job[0], 'read'):
+        return (job[0].read(),) + tuple(job[1:])
+    return job
+
+
+def read_jobs(jobs):
+    """
+    Reads the sources of jobs (see read_job).
+
+    Returns
+    -------
+    jobs: list
+        The jobs that could be read
+    failed: list
+        The UnlockResult of the jobs that could not be read
+    """
+
+    loaded = []
+    failed = []
+    for job in jobs:
+        try:
+            loaded.append(read_job(job))
+        except Exception as e:
+            logging.error(f'Failed to read PDF file: {job[1]}')
+            failed.append(UnlockResult(job[1], job[2], False, repr(e)))
+    return loaded, failed
+
+
+def run_jobs(jobs, workers=None, cancel=None, max_bytes=MAX_IN_FLIGHT_BYTES, batch_bytes=BATCH_BYTES, pool=None,
+             timeout=None, max_rss=None, **options):
+    """
+    Runs resave_pdf for every job on a pool of worker processes and yields the results as they are finished.
+    Jobs are taken from the iterable only when a worker is about to need them, so a generator (e.g. reading
+    from a zip file) is never read far ahead of the workers.
+
+    Parameters
+    ----------
+    jobs: iterable
+        Tuples with the arguments of resave_pdf: (source, file, file_out). A source with read() and size (e.g. a
+        uz.ZipMember) is only read when the job is sent to a worker, so its size counts against max_bytes before
+        it is in memory
+    workers: int
+        The number of worker processes, default is the number of cpu's. With 1 worker the jobs are
+        run one after another in the calling process
+    cancel: threading.Event
+        When set, no new jobs are started and queued jobs are dropped; jobs that are already running are
+        finished and yielded, so no half written files are left behind
+    max_bytes: int
+        The maximum total size of the large files (see LARGE_FILE_SIZE) in flight. A large file that does not fit
+        waits until enough large files are finished, while the smaller files behind it keep going to the workers.
+        A file larger than max_bytes is run when no other large file is in flight
+    batch_bytes: int
+        The maximum total size of a batch of small files (see SMALL_FILE_SIZE) sent to a worker at once, 0 sends
+        every file on its own
+    pool: WorkerPool
+        A pool of worker processes that is kept after the jobs are done (e.g. in watch mode), default is a new
+        pool of worker processes for these jobs only
+    timeout: float
+        The maximum seconds a worker may work on one file. The worker is killed, the file is quarantined (its
+        result has category wd.QUARANTINED and the reason as error) and the other files are retried. A pool that
+        is passed in uses its own limits (see WorkerPool)
+    max_rss: int
+        The maximum resident memory in bytes of a worker process, enforced like timeout
+    options:
+        Keyword arguments passed on to resave_pdf (e.g. fast_path)
+
+    When a worker dies, every file that was in flight gets a BrokenProcessPool error, also the files of the other
+    workers. These files are run again one at a time, with no other file in flight, and only a file that breaks
+    the pool while it runs alone counts an attempt (see MAX_ATTEMPTS).
+
+    Yields
+    ------
+    result: UnlockResult
+        The result of every job
+    """
+
+    workers = pool.workers if pool is not None else workers or os.cpu_count() or 1
+    if pool is None and workers == 1 and not timeout and not max_rss:
+        for job in jobs:
+            if cancel is not None and cancel.is_set():
+                logging.info('Unlocking cancelled')
+                break
+            loaded, failed = read_jobs([job])
+            yield from failed
+            for job in loaded:
+                yield resave_pdf(*job, **options)
+        return
+
+    logging.info(f'Unlocking with {workers} worker processes')
+    own_pool = pool is None
+    if own_pool:
+        pool = WorkerPool(workers, timeout=timeout, max_rss=max_rss)
+    jobs = iter(jobs)
+    retry = []
+    held = None  # a job taken from jobs that did not fit in the current batch, with its size
+    waiting = collections.deque()  # large jobs that do not fit in max_bytes yet, with their size
+    large = {}  # the size of the large jobs in flight
+    attempts = {}
+    suspects = collections.deque()  # jobs that were in flight when a worker died, run alone
+    max_in_flight = workers * 4  # keep the workers busy without queueing every file at once
+
+    def next_job(small_only=False):
+        # the next job that may be submitted now with its size, or None
+        nonlocal held
+        if waiting and not small_only and (not large or sum(large.values()) + waiting[0][1] <= max_bytes):
+            return waiting.popleft()
+        while len(waiting) < max_in_flight:
+            if held is None:
+                job = retry.pop() if retry else next(jobs, None)
+                if job is None:
+                    return None
+                held = job, source_size(job[0])
+            job, size = held
+            if small_only and size >= SMALL_FILE_SIZE:
+                return None
+            held = None
+            if size >= LARGE_FILE_SIZE and large and (waiting or sum(large.values()) + size > max_bytes):
+                logging.debug('Waiting for memory to unlock large file: %s', job[1])
+                waiting.append((job, size))
+                continue
+            return job, size
+        return None
+
+    executor = pool.get()
+    kills = pool.kills
+    in_flight = {}
+    try:
+        while True:
+            if cancel is not None and cancel.is_set() and jobs is not None:
+                logging.info('Unlocking cancelled')
+                jobs = None
+                retry = []
+                held = None
+                waiting.clear()
+                suspects.clear()
+                for future in [future for future in in_flight if future.cancel()]:
+                    del in_flight[future]
+                    large.pop(future, None)
+            while jobs is not None and len(in_flight) < max_in_flight:
+                if suspects:
+                    # one of the files that were in flight when a worker died may have caused it, so they are run
+                    # alone to find out which
+                    if in_flight:
+                        break
+                    batch, failed = read_jobs([suspects.popleft()])
+                    yield from failed
+                    if batch:
+                        in_flight[executor.submit(resave_batch, batch, **options)] = batch
+                    continue
+                taken = next_job()
+                if taken is None:
+                    break
+                batch = [taken[0]]
+                size = batch_size = taken[1]
+                # small files are sent to the workers in batches, so the time per file is not spent on
+                # sending the job and the result between the processes
+                while size < SMALL_FILE_SIZE and len(batch) < BATCH_SIZE and batch_size < batch_bytes:
+                    taken = next_job(small_only=True)
+                    if taken is None:
+                        break
+                    batch.append(taken[0])
+                    batch_size += taken[1]
+                batch, failed = read_jobs(batch)
+                yield from failed
+                if not batch:
+                    continue
+                future = executor.submit(resave_batch, batch, **options)
+                in_flight[future] = batch
+                if size >= LARGE_FILE_SIZE:
+                    large[future] = size
+            if not in_flight:
+                break
+            alone = len(in_flight) == 1 and len(next(iter(in_flight.values()))) == 1
+            done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+            broken = []
+            for future in done:
+                batch = in_flight.pop(future)
+                large.pop(future, None)
+                try:
+                    results = future.result()
+                except BrokenProcessPool as e:
+                    # a worker died (e.g. crashed inside qpdf or killed by the watchdog)
+                    broken.append((batch, e))
+                    continue
+                yield from results
+            if broken:
+                logging.error('Worker process died, restarting worker pool')
+                stopped = [job for batch in in_flight.values() for job in batch]
+                in_flight = {}
+                large = {}
+                # the old processes are stopped when the pool is replaced, so no worker writes a temporary file
+                # that is removed here
+                executor = pool.restart()
+                for job in stopped:
+                    ck.remove_temp(job[2])
+                killed, kills = pool.kills > kills, pool.kills
+                (retry if killed else suspects).extend(stopped)
+                for batch, e in broken:
+                    for job in batch:
+                        file, file_out = job[1], job[2]
+                        ck.remove_temp(file_out)
+                        if file in pool.quarantined:
+                            yield UnlockResult(file, file_out, False, pool.quarantined[file], 0.0, wd.QUARANTINED)
+                            continue
+                        if killed:
+                            # killed by the watchdog because of another file, not counted as an attempt
+                            retry.append(job)
+                            continue
+                        if not alone:
+                            # any of the files in flight may have broken the pool, not counted as an attempt
+                            suspects.append(job)
+                            continue
+                        attempts[file] = attempts.get(file, 0) + 1
+                        if attempts[file] < MAX_ATTEMPTS:
+                            suspects.append(job)
+                        else:
+                            logging.error(f'Failed to resave PDF file: {file_out}')
+                            yield UnlockResult(file, file_out, False, repr(e))
+    finally:
+        for future in in_flight:
+            future.cancel()
+        if own_pool:
+            pool.shutdown()
+
+
+def init_worker(initializer=None, initargs=()):
+    """
+    Initializer of every worker process of a WorkerPool: Ctrl+C is left to the main process, which stops the run
+    and the pool, so the workers do not all print a KeyboardInterrupt traceback. Then runs the initializer of the
+    pool (e.g. the logging of _functions.log_config).
+    """
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+class WorkerPool:
+    """
+    A pool of worker processes for run_jobs. The processes are started at the first job and kept until shutdown,
+    so a long running tool (e.g. watch mode) does not start new processes and import pikepdf again for every batch.
+    Can be used as a context manager.
+
+    With a timeout or max_rss the workers are supervised by a watchdog (see _functions.watchdog) that kills a worker
+    over the limits; run_jobs then quarantines its file and replaces the pool.
+
+    Attributes
+    ----------
+    workers: int
+        The number of worker processes
+    timeout: float
+        The maximum seconds a worker may work on one file, None is no limit
+    max_rss: int
+        The maximum resident memory in bytes of a worker process, None is no limit
+    """
+
+    def __init__(self, workers=None, timeout=None, max_rss=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.max_rss = max_rss
+        self.executor = None
+        self.watchdog = None
+
+    @property
+    def quarantined(self):
+        """
+        The reason of every file whose worker was killed by the watchdog.
+        """
+
+        return self.watchdog.quarantined if self.watchdog is not None else {}
+
+    @property
+    def kills(self):
+        return self.watchdog.kills if self.watchdog is not None else 0
+
+    def get(self):
+        """
+        Returns the executor, started if needed. The workers log to the same log file as this process.
+        """
+
+        if self.executor is None:
+            supervised = bool(self.timeout or self.max_rss)
+            initializer, initargs = init_worker, lc.worker_initializer(supervised)
+            if supervised:
+                if self.watchdog is None:
+                    self.watchdog = wd.Watchdog(self.timeout, self.max_rss)
+                initializer, initargs = wd.init_worker, (self.watchdog.status_dir, initializer, initargs)
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=initializer,
+                                                                   initargs=initargs)
+        return self.executor
+
+    def restart(self):
+        """
+        Replaces the executor, e.g. after a worker process died.
+        """
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        if self.watchdog is not None:
+            self.watchdog.reset()
+        return self.get()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        if self.watchdog is not None:
+            self.watchdog.stop()
+            self.watchdog = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+def resave_batch(jobs, **options):
+    """
+    Runs resave_pdf for a batch of jobs in one worker process and returns the list of results.
+    """
+
+    results = []
+    for job in jobs:
+        wd.started(job[1])
+        results.append(resave_pdf(*job, **options))
+        wd.finished()
+    return results
+
+
+def unlock_pdf(files_to_unlock, process_dir, out_dir, workers=None, on_metrics=None, cancel=None, journal=None):
     """
     Unlocks pdf files and saves the unlocked files in a new directory or with a new name (in case of a single selected file).
+    Shows a progress bar while the files are unlocked on a background thread, the window stays responsive.
 
     Parameters
     ----------
@@ -33,8 +705,45 @@ def unlock_pdf(files_to_unlock, process_dir, out_dir):
     out_dir: str 
         The output directory where converted files will be placed
         is an array with path to the selected files
+    workers: int
+        The number of worker processes, default is the number of cpu's
+    on_metrics: callable
+        Called with a metrics record (see _functions.metrics) for every file
+    cancel: threading.Event
+        Set by the Stop button; when set, the files that are being unlocked are finished and no new files are started
+    journal: Journal
+        The checkpoint journal (see _functions.checkpoint) every unlocked file is recorded in
+
+    Returns
+    -------
+    results: list
+        The UnlockResult of every file (only the files that were unlocked before stopping, if cancel is set)
     """
 
+    # tkinter is only needed for the progress bar, the rest of the module also runs without a display
+    import tkinter as tk
+    from tkinter import ttk
+
+    cancel = cancel if cancel is not None else threading.Event()
+    results_queue = queue.Queue()
+
+    def unlock_in_background():
+        try:
+            for result in iter_unlock(files_to_unlock=files_to_unlock, process_dir=process_dir,
+                                      out_dir=out_dir, workers=workers, cancel=cancel):
+                results_queue.put(result)
+        except Exception:
+            logging.exception('Failed to unlock PDF files')
+        finally:
+            results_queue.put(None)  # done
+
+    def stop():
+        if not cancel.is_set():
+            logging.info('Tool cancelled')
+            cancel.set()
+            label.configure(text='Stopping, finishing the pdf\'s in progress')
+            button.state(['disabled'])
+
     # create progress bar
     parent = tk.Tk()
     w = parent.winfo_reqwidth()
@@ -66,15 +775,9 @@ def unlock_pdf(files_to_unlock, process_dir, out_dir):
     progress.grid(row=1, column=1, columnspan=2, padx=5, pady=5)
     label = ttk.Label(parent, text='Unlocking pdf\'s')
     label.grid(row=2, column=1, pady=5, padx=5, sticky='nswe')
-    button = ttk.Button(parent, text='Stop', command=lambda: [parent.destroy(),
-                                                                 parent.quit(),
-                                                                 logging.shutdown(),
-                                                                 logging.info('Tool cancelled')])
+    button = ttk.Button(parent, text='Stop', command=stop)
     button.grid(row=3, column=2, pady=5, padx=5, sticky='e')
-    parent.protocol("WM_DELETE_WINDOW", lambda: [parent.destroy(),
-                                                 parent.quit(),
-                                                 logging.shutdown(),
-                                                 logging.info('Tool cancelled')])
+    parent.protocol("WM_DELETE_WINDOW", stop)
 
     # set start value PDF unlock
     progress['value'] = 1
@@ -84,48 +787,39 @@ def unlock_pdf(files_to_unlock, process_dir, out_dir):
 
     # start unloking pdf's
     logging.info('Started unlocking PDF files')
+    results = []
 
-    for file in files_to_unlock:
-        # create output directory/subdirectory
-        file_out = file.replace(process_dir, out_dir)
-        logging.info(f'file_out: {file_out}')
-        root_dir = os.path.dirname(file_out)
-        try:
-            Path(root_dir).mkdir(parents=True, exist_ok=True)  ## Create output dir
-            logging.debug(f'Creating output directory: {root_dir}')
-        except:
-            logging.error(f'Failed to create output directory: {root_dir}')
-
-        # Open pdf and save with pikepdf to get rid of any write protections
-        # Copy to tempdir since input file cannot be overwritten
-        temp_dir = tempfile.gettempdir()
-        cmd = 'copy "%s" "%s"' % (file, temp_dir)
-        try:
-            subprocess.call(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                            stdin=subprocess.PIPE)
-            pdf_file = os.path.join(
-                temp_dir, os.path.basename(file))  # path to tempfile
-            pdf = pikepdf.open(pdf_file)  # Open tempfile
-            if 'Metadata' in pdf.Root.keys():  # if PDF metadata is present, delete it
-                try:
-                    del pdf.Root.Metadata
-                    logging.debug(f'Deleting metadata from file: {file}')
-                except:
-                    logging.error(
-                        f'Failed to delete metadata from file: {file}')
-            pdf.save(file_out)  # Save processed pdf
-            logging.debug(f'Resave PDF file: {file_out}')
-        except:
-            logging.error(f'Failed to resave PDF file: {file_out}')
-
-        # set progress bar max value
-        progress['value'] += 99 / \
-            len(files_to_unlock) if len(files_to_unlock) > 0 else 99
-        progress.update()
-        progress.update_idletasks()
+    def poll():
+        # take all results that arrived since the last poll and redraw the progress bar once
+        finished = False
+        while True:
+            try:
+                result = results_queue.get_nowait()
+            except queue.Empty:
+                break
+            if result is None:
+                finished = True
+                break
+            results.append(result)
+            if journal is not None and result.unlocked:
+                journal.record(ck.UNLOCK, result.file, result.file_out)
+            if on_metrics is not None:
+                on_metrics(mt.unlock_record(result))
+        if finished:
+            parent.quit()
+            return
+        progress['value'] = 1 + 99 * len(results) / len(files_to_unlock) if len(files_to_unlock) > 0 else 100
         style.configure(
             'text.Horizontal.TProgressbar',
             text='{:.0f} %'.format(progress['value'])
         )
+        parent.after(POLL_MS, poll)
 
+    worker = threading.Thread(target=unlock_in_background, daemon=True)
+    worker.start()
+    parent.after(POLL_MS, poll)
+    parent.mainloop()
+    worker.join()
     parent.destroy()
+
+    return results
@@ -1,8 +1,14 @@
+import collections
+import concurrent.futures
+import io
 import logging
 import os
+import shutil
+import time
 import zipfile
 from pathlib import Path
 import _functions.check_length as cl
+import _functions.checkpoint as ck
 
 """
     This file is called from the main file PDF_unloch_tool.py. It is used to unzip files and save status in a log file.
@@ -10,15 +16,15 @@ import _functions.check_length as cl
     Author: Joana Cardoso
 """
 
-logging.basicConfig(level=logging.DEBUG,
-                    format='%(asctime)s %(levelname)s %(funcName)s %(message)s',
-                    filename='Logging_UnlockTool.log'
-                    )  # to see log in console remove filename
 
+# Members are copied in chunks of this size, so memory use does not depend on the size of the members
+CHUNK_SIZE = 1024 * 1024
 
-def unzip_files(zip_dir, proc_dir):
+
+def unzip_files(zip_dir, proc_dir, workers=None, on_metrics=None, journal=None):
     """
-    Unzips files and saves the unzipped files in a new directory
+    Unzips files and saves the unzipped files in a new directory. Zip files found in the zip file are unzipped
+    as well (into a folder with the name of the zip file) and removed afterwards.
 
     Parameters
     ----------
@@ -26,53 +32,201 @@ def unzip_files(zip_dir, proc_dir):
         The path to the selected zip file
     proc_dir: str 
         The directory of the unzipped folder
+    workers: int
+        The number of threads extracting members at the same time, default is chosen by concurrent.futures
+    on_metrics: callable
+        Called with a metrics record (see _functions.metrics) for every unzipped member
+    journal: Journal
+        The checkpoint journal (see _functions.checkpoint), every unzipped member is recorded and members that were
+        unzipped in a previous run are skipped
     """
 
     logging.info(f'Started unzipping folder: {zip_dir}')
     logging.info(f'Zip directory: {zip_dir}')
     logging.info(f'Process directory: {proc_dir}')
 
-    with zipfile.ZipFile(zip_dir, 'r') as zip_file:
-        for file in zip_file.namelist():
+    # Nested zip files are put on a queue instead of unzipping them recursively
+    to_unzip = collections.deque([(zip_dir, proc_dir, False)])
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        while to_unzip:
+            zip_dir, proc_dir, remove = to_unzip.popleft()
+            for new_zip_dir in _unzip(zip_dir, proc_dir, executor, on_metrics, journal):
+                logging.info(f'Sub-zip filename: {os.path.basename(new_zip_dir)}')
+                new_proc_dir = os.path.abspath(
+                    os.path.splitext(new_zip_dir)[0])
+                logging.info(f'new_zip_dir: {new_zip_dir}')
+                logging.info(f'new_proc_dir: {new_proc_dir}')
+                to_unzip.append((new_zip_dir, new_proc_dir, True))
+            if remove:
+                try:
+                    os.remove(zip_dir)
+                    logging.debug('Removed zip: %s', zip_dir)
+                except:
+                    logging.debug('Failed to remove zip: %s', zip_dir)
+
+
+def _unzip(zip_dir, proc_dir, executor, on_metrics=None, journal=None):
+    """
+    Unzips the members of one zip file on the threads of executor and returns the paths of the unzipped zip files.
+    Members in the journal are not unzipped again; a nested zip file in the journal that still exists was not
+    finished and is returned again.
+    """
+
+    nested = []
+    try:
+        zip_file = zipfile.ZipFile(zip_dir, 'r')
+    except:
+        logging.error(f'Failed to open zip: {zip_dir}')
+        return nested
+
+    with zip_file:
+        members = {}  # des_dir: [(info, filename)], the members to unzip per directory
+        taken = {}  # des_dir: the names given in the directory
+        for info in zip_file.infolist():
+            file = info.filename
             filename = os.path.basename(file)
-            logging.info(f'Found file {file} in zip directory')
+            logging.debug('Found file %s in zip directory', file)
             des_dir = os.path.join(proc_dir, os.path.dirname(file))
-            logging.info(f'Unzipped directory: {des_dir}')
+            logging.debug('Unzipped directory: %s', des_dir)
             try:
                 # Create extract dir
                 Path(des_dir).mkdir(parents=True, exist_ok=True)
-                logging.debug(f'Creating unzipped directory: {des_dir}')
+                logging.debug('Creating unzipped directory: %s', des_dir)
             except:
                 logging.error(f'Failed to create unzip directory: {des_dir}')
             if not filename:
                 continue
+            source = os.path.join(zip_dir, file)
+            if journal is not None and journal.output(ck.UNZIP, source):
+                recorded = journal.output(ck.UNZIP, source)
+                if filename.lower().endswith('.zip'):
+                    # a nested zip file is removed when all its members are unzipped
+                    logging.debug('Already unzipped: %s', filename)
+                    if os.path.exists(recorded):
+                        nested.append(recorded)
+                    continue
+                if journal.is_done(ck.UNZIP, source):
+                    logging.debug('Already unzipped: %s', filename)
+                    taken.setdefault(des_dir, set()).add(os.path.normcase(os.path.basename(recorded)))
+                    continue
+            members.setdefault(des_dir, []).append((info, filename))
+
+        # the names of all members of a directory are checked at once, so two long names never get the same name
+        futures = {}
+        for des_dir, infos in members.items():
+            file_names = cl.shorten_names(des_dir, [filename for info, filename in infos],
+                                          taken=taken.setdefault(des_dir, set()))
+            for (info, filename), (file_name, long_name) in zip(infos, file_names):
+                futures[executor.submit(_extract_member, zip_file, info, file_name)] = (info, filename, file_name)
+
+        for future in concurrent.futures.as_completed(futures):
+            info, filename, file_name = futures[future]
+            seconds, error = future.result()
+            if error is None:
+                logging.debug('Unzipping file: %s', filename)
+                if journal is not None:
+                    journal.record(ck.UNZIP, os.path.join(zip_dir, info.filename), file_name)
+                if filename.lower().endswith('.zip'):
+                    nested.append(file_name)
             else:
-                file_name = cl.check_length(des_dir=des_dir, file=filename)[0]
+                logging.error(f'Failed to unzip: {filename}')
+            if on_metrics is not None:
+                on_metrics({'type': 'file', 'stage': 'unzip', 'file': os.path.join(zip_dir, info.filename),
+                            'file_out': file_name, 'seconds': seconds, 'bytes_in': info.compress_size,
+                            'bytes_out': info.file_size if error is None else 0, 'error': error})
 
-                try:
-                    data = zip_file.read(file)
-                    # exporting to given location one by one
-                    output = open(file_name, 'wb')
-                    output.write(data)
-                    output.close()
-                    logging.debug(f'Unzipping file: {filename}')
-                except:
-                    logging.error(f'Failed to unzip: {filename}')
-
-                # Call function recursively untill all zip files are extracted
-                if filename.endswith('.zip'):
-                    logging.info(f'Sub-zip filename: {filename}')
-                    new_zip_dir = os.path.join(des_dir, filename)
-                    new_proc_dir = os.path.abspath(
-                        os.path.splitext(new_zip_dir)[0])
-                    logging.info(f'new_zip_dir: {new_zip_dir}')
-                    logging.info(f'new_proc_dir: {new_proc_dir}')
-
-                    logging.info('Recursive')
-                    unzip_files(zip_dir=new_zip_dir, proc_dir=new_proc_dir)
+    return nested
+
+
+def _extract_member(zip_file, info, file_name):
+    """
+    Copies one member of a zip file to file_name in chunks of CHUNK_SIZE, through a temporary file so file_name is
+    never a partial file. Returns the seconds it took and the error message, which is None if it succeeded.
+    """
+
+    start = time.perf_counter()
+    try:
+        with zip_file.open(info) as member, open(ck.temp_path(file_name), 'wb') as output:
+            shutil.copyfileobj(member, output, CHUNK_SIZE)
+        ck.replace_temp(file_name)
+    except Exception as e:
+        ck.remove_temp(file_name)
+        return time.perf_counter() - start, repr(e)
+    return time.perf_counter() - start, None
+
+
+class ZipMember:
+    """
+    A file in an open zip file that is only read when it is needed, e.g. the source of a job of uf.run_jobs: a large
+    pdf file that waits for memory is not held in memory while it waits.
+
+    Attributes
+    ----------
+    info: zipfile.ZipInfo
+        The member
+    size: int
+        The size of the member when it is read (uncompressed)
+    """
+
+    def __init__(self, zip_file, info):
+        self.zip_file = zip_file
+        self.info = info
+        self.size = info.file_size
+
+    def read(self):
+        """
+        Reads the member. The zip file is closed when no member needs it any more (see iter_zip_members).
+        """
+
+        zip_file, self.zip_file = self.zip_file, None
+        return zip_file.read(self.info)
+
+
+def iter_zip_members(zip_dir, proc_dir, keep_open=False):
+    """
+    Goes through the files in a zip file, including the files in nested zip files, without extracting anything
+    to disk. Nested zip files are read into memory and opened from there.
+
+    Parameters
+    ----------
+    zip_dir: str
+        The path to the selected zip file
+    proc_dir: str
+        The directory the zip file would be unzipped to, used to build the paths of the members
+    keep_open: bool
+        Leave the zip files open after their members are yielded, so members can be read later (see ZipMember).
+        A zip file is then closed when nothing refers to it any more
+
+    Yields
+    ------
+    member: tuple
+        (zip_file, info, des_path) with the open zipfile.ZipFile, the zipfile.ZipInfo of the member and the path
+        the member would have when unzipped (a nested zip file named x.zip is unzipped into the folder x).
+        Without keep_open, the member has to be read before the next member is requested
+    """
+
+    logging.info(f'Started streaming zip folder: {zip_dir}')
+    to_open = [(zip_dir, proc_dir)]
+    while to_open:
+        source, des_root = to_open.pop()
+        try:
+            zip_file = zipfile.ZipFile(source, 'r')
+        except Exception:
+            logging.error(f'Failed to open zip: {des_root}')
+            continue
+        try:
+            for info in zip_file.infolist():
+                des_path = os.path.normpath(os.path.join(des_root, info.filename))
+                if not info.is_dir() and info.filename.lower().endswith('.zip'):
+                    logging.debug('Sub-zip filename: %s', info.filename)
                     try:
-                        os.remove(new_zip_dir)
-                        logging.debug(f'Removed zip: {new_zip_dir}')
-                    except:
-                        logging.debug(f'Failed to remove zip: {new_zip_dir}')
-    zip_file.close()
\ No newline at end of file
+                        nested = io.BytesIO(zip_file.read(info))
+                        to_open.append((nested, os.path.splitext(des_path)[0]))
+                    except Exception:
+                        logging.error(f'Failed to read sub-zip: {info.filename}')
+                    continue
+                yield zip_file, info, des_path
+        finally:
+            if not keep_open:
+                zip_file.close()
+            zip_file = None
@@ -0,0 +1,328 @@
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+import _functions.checkpoint as ck
+import _functions.dedup_files as dd
+import _functions.metrics as mt
+import _functions.pipeline as pl
+import _functions.scan_files as sf
+import _functions.unlock_file as uf
+import _functions.watchdog as wd
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None  # the inbox is polled
+
+"""
+    This file is called from the command line entry point PDF_unlock_cli.py (--watch). It watches an inbox folder
+    and unlocks every zip file, folder or pdf file that is dropped in it, without starting the tool for every
+    delivery. New items are found with inotify (if the package inotify_simple is installed) or by polling, and are
+    only taken in when they did not change for a while, so files that are still being copied are left alone.
+"""
+
+
+# Seconds an item may not change before it is taken in
+SETTLE_SECONDS = 5.0
+# Seconds between two scans of the inbox
+POLL_SECONDS = 2.0
+# Maximum number of items unlocked in one batch
+BATCH_SIZE = 10
+# Maximum number of settled items waiting to be unlocked, the inbox is not scanned while the queue is full
+MAX_QUEUE = 100
+# Options of pipeline.unlock_tree that also apply to the loose pdf files of a batch
+LOOSE_OPTIONS = ('max_bytes', 'read_ahead', 'scratch_dir', 'fast_path', 'profile')
+
+
+def signature(path):
+    """
+    Returns what is compared to see if an item in the inbox is still changing: the size and modification time of
+    a file, or the number of entries, total size and last modification time of a folder. None if it disappeared.
+    """
+
+    try:
+        if os.path.isdir(path):
+            stats = [os.stat(os.path.join(root, name)) for root, dirs, files in os.walk(path) for name in files]
+            return (len(stats), sum(stat.st_size for stat in stats),
+                    max([stat.st_mtime for stat in stats], default=0.0))
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime
+    except OSError:
+        return None
+
+
+class InboxWatcher:
+    """
+    Finds the items (zip files, pdf files and folders) in the top level of an inbox folder that did not change for
+    settle_seconds. Every item is returned once.
+
+    Attributes
+    ----------
+    inbox: str
+        The watched folder
+    """
+
+    def __init__(self, inbox, settle_seconds=SETTLE_SECONDS, poll_seconds=POLL_SECONDS):
+        self.inbox = inbox
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        self.changing = {}  # path: (signature, time the signature was first seen)
+        self.taken = set()
+        self.inotify = None
+        if inotify_simple is not None:
+            try:
+                self.inotify = inotify_simple.INotify()
+                flags = inotify_simple.flags
+                self.inotify.add_watch(inbox, flags.CREATE | flags.CLOSE_WRITE | flags.MOVED_TO | flags.DELETE |
+                                       flags.MOVED_FROM)
+                logging.info(f'Watching inbox with inotify: {inbox}')
+            except OSError:
+                self.inotify = None
+        if self.inotify is None:
+            logging.info(f'Polling inbox every {poll_seconds} s: {inbox}')
+
+    def wait(self):
+        """
+        Waits poll_seconds, or less if inotify reports a change in the inbox.
+        """
+
+        if self.inotify is not None:
+            self.inotify.read(timeout=int(self.poll_seconds * 1000))
+        else:
+            time.sleep(self.poll_seconds)
+
+    def settled(self):
+        """
+        Scans the inbox and returns the items that did not change for settle_seconds.
+        """
+
+        now = time.monotonic()
+        present = set()
+        settled = []
+        with os.scandir(self.inbox) as it:
+            for entry in it:
+                if entry.name.startswith('.') or entry.name.endswith(ck.TEMP_SUFFIX):
+                    continue
+                if not entry.is_dir() and sf.classify(entry.name) not in (sf.PDF, sf.ZIP):
+                    continue
+                present.add(entry.path)
+                if entry.path in self.taken:
+                    continue
+                current = signature(entry.path)
+                previous = self.changing.get(entry.path)
+                if current is None:
+                    continue
+                if previous is None or previous[0] != current:
+                    self.changing[entry.path] = (current, now)
+                elif now - previous[1] >= self.settle_seconds:
+                    del self.changing[entry.path]
+                    self.taken.add(entry.path)
+                    settled.append(entry.path)
+        # forget items that were moved away, so a new item with the same name is taken in again
+        self.taken &= present
+        for path in [path for path in self.changing if path not in present]:
+            del self.changing[path]
+        return sorted(settled)
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+
+
+def take_in(path, processed_dir):
+    """
+    Moves an item from the inbox to the processed folder (with a time stamp if the name is taken) and returns the
+    new path, so the item is unlocked outside the inbox and not found again.
+    """
+
+    name = os.path.basename(path)
+    target = os.path.join(processed_dir, name)
+    if os.path.exists(target):
+        stem, extension = os.path.splitext(name) if os.path.isfile(path) else (name, '')
+        target = os.path.join(processed_dir, stem + time.strftime('_%Y%m%d_%H%M%S') + extension)
+    os.makedirs(processed_dir, exist_ok=True)
+    shutil.move(path, target)
+    return target
+
+
+def unlock_batch(batch, processed_dir, out_dir, pool, on_summary=None, **options):
+    """
+    Unlocks a batch of settled items with the worker pool. Folders and zip files are run through
+    pipeline.unlock_tree (unzip, rename, unlock) into out_dir/<name>_unlocked, the loose pdf files of the batch are
+    unlocked together into out_dir.
+
+    Parameters
+    ----------
+    batch: list
+        The settled items in the inbox
+    processed_dir: str
+        The folder items are moved to before they are unlocked
+    out_dir: str
+        The folder the unlocked files are placed in
+    pool: WorkerPool
+        The worker processes, kept between batches
+    on_summary: callable
+        Called with the summary of every item (see pipeline.unlock_tree)
+    options:
+        Keyword arguments passed on to pipeline.unlock_tree (e.g. fast_path, profile, dedup)
+    """
+
+    pdf_files = []
+    for path in batch:
+        try:
+            path = take_in(path, processed_dir)
+        except:
+            logging.error(f'Failed to take in: {path}')
+            continue
+        logging.info(f'Taken in: {path}')
+        if os.path.isfile(path) and sf.classify(path) == sf.PDF:
+            pdf_files.append(path)
+            continue
+        name = os.path.splitext(os.path.basename(path))[0] if os.path.isfile(path) else os.path.basename(path)
+        try:
+            summary = pl.unlock_tree(path, os.path.join(out_dir, name + '_unlocked'), workers=pool.workers,
+                                     pool=pool, **options)
+        except:
+            logging.error(f'Failed to unlock: {path}')
+            continue
+        logging.info(f'Unlocked {summary["unlocked_pdfs"]} of {summary["pdf_files"]} pdf files: {path}')
+        if on_summary is not None:
+            on_summary(summary)
+
+    if pdf_files:
+        summary = unlock_loose(pdf_files, processed_dir, out_dir, pool, **options)
+        if on_summary is not None:
+            on_summary(summary)
+
+
+def unlock_loose(pdf_files, processed_dir, out_dir, pool, on_metrics=None, dedup=False, **options):
+    """
+    Unlocks the loose pdf files of a batch into out_dir with the same options as pipeline.unlock_tree, returns a
+    summary like unlock_tree.
+    """
+
+    sizes = {}
+    for file in pdf_files:
+        try:
+            sizes[file] = os.path.getsize(file)
+        except OSError:
+            sizes[file] = 0
+    files_to_unlock, duplicates = pdf_files, {}
+    if dedup:
+        files_to_unlock, duplicates = dd.group_duplicates(pdf_files, sizes)
+    failed = []
+    quarantined = []
+    categories = {}
+    with mt.timed_stage(on_metrics, 'unlock'):
+        for result in uf.iter_unlock(files_to_unlock, processed_dir, out_dir, pool=pool, sizes=sizes,
+                                     **{key: options[key] for key in LOOSE_OPTIONS if key in options}):
+            if on_metrics is not None:
+                on_metrics(mt.unlock_record(result))
+            copies = duplicates.get(result.file, [])
+            if result.category is not None:
+                categories[result.category] = categories.get(result.category, 0) + 1 + len(copies)
+            if not result.unlocked:
+                failed.append(result.file)
+                failed.extend(copies)
+                if result.category == wd.QUARANTINED:
+                    quarantined.append((result.file, result.error))
+                continue
+            for file in copies:
+                if not dd.place_duplicate(result.file_out, file.replace(processed_dir, out_dir)):
+                    failed.append(file)
+    logging.info(f'Unlocked {len(pdf_files) - len(failed)} of {len(pdf_files)} loose pdf files')
+    summary = {'process_dir': processed_dir, 'out_dir': out_dir, 'pdf_files': len(pdf_files),
+               'unlocked_pdfs': len(pdf_files) - len(failed), 'failed': failed, 'quarantined': quarantined,
+               'categories': categories}
+    if dedup:
+        summary['duplicates'] = len(pdf_files) - len(files_to_unlock)
+    return summary
+
+
+def watch(inbox, out_dir=None, processed_dir=None, workers=None, batch_size=BATCH_SIZE, max_queue=MAX_QUEUE,
+          settle_seconds=SETTLE_SECONDS, poll_seconds=POLL_SECONDS, stop=None, on_summary=None, timeout=None,
+          max_rss=None, **options):
+    """
+    Watches an inbox folder and unlocks the items dropped in it until stop is set (or the process is interrupted).
+    A background thread finds the settled items and puts them on a bounded queue; when the queue is full it waits
+    (backpressure) and new items stay in the inbox. The main thread takes up to batch_size items at a time and
+    unlocks them with a pool of worker processes that is kept for the whole session.
+
+    Parameters
+    ----------
+    inbox: str
+        The watched folder
+    out_dir: str
+        The folder the unlocked files are placed in, default is the inbox followed by _unlocked
+    processed_dir: str
+        The folder items are moved to when they are taken in, default is the inbox followed by _processed
+    workers: int
+        The number of worker processes, default is the number of cpu's
+    batch_size: int
+        The maximum number of items unlocked in one batch
+    max_queue: int
+        The maximum number of settled items waiting to be unlocked
+    settle_seconds: float
+        The seconds an item may not change before it is taken in
+    poll_seconds: float
+        The seconds between two scans of the inbox
+    stop: threading.Event
+        Set to stop watching, the batch that is being unlocked is finished first
+    on_summary: callable
+        Called with the summary of every unlocked item (see unlock_batch)
+    timeout: float
+        The maximum seconds a worker process may work on one pdf file, the file is quarantined (see uf.WorkerPool)
+    max_rss: int
+        The maximum resident memory in bytes of a worker process
+    options:
+        Keyword arguments passed on to pipeline.unlock_tree (e.g. fast_path, profile, dedup)
+    """
+
+    inbox = os.path.abspath(inbox)
+    out_dir = os.path.abspath(out_dir) if out_dir else inbox + '_unlocked'
+    processed_dir = os.path.abspath(processed_dir) if processed_dir else inbox + '_processed'
+    stop = stop if stop is not None else threading.Event()
+    settled = queue.Queue(maxsize=max_queue)
+    watcher = InboxWatcher(inbox, settle_seconds=settle_seconds, poll_seconds=poll_seconds)
+    logging.info(f'Output directory: {out_dir}')
+    logging.info(f'Processed directory: {processed_dir}')
+
+    def detect():
+        while not stop.is_set():
+            try:
+                for path in watcher.settled():
+                    logging.debug('Settled: %s', path)
+                    while not stop.is_set():
+                        try:
+                            settled.put(path, timeout=poll_seconds)
+                            break
+                        except queue.Full:
+                            logging.debug('Queue full, waiting to take in: %s', path)
+            except Exception:
+                logging.exception(f'Failed to scan inbox: {inbox}')
+            watcher.wait()
+
+    detector = threading.Thread(target=detect, daemon=True)
+    detector.start()
+    try:
+        with uf.WorkerPool(workers, timeout=timeout, max_rss=max_rss) as pool:
+            while not stop.is_set():
+                try:
+                    batch = [settled.get(timeout=poll_seconds)]
+                except queue.Empty:
+                    continue
+                while len(batch) < batch_size:
+                    try:
+                        batch.append(settled.get_nowait())
+                    except queue.Empty:
+                        break
+                logging.info(f'Unlocking batch of {len(batch)} items')
+                unlock_batch(batch, processed_dir, out_dir, pool, on_summary=on_summary, **options)
+    finally:
+        stop.set()
+        detector.join()
+        watcher.close()
+        logging.info('Stopped watching')
@@ -0,0 +1,184 @@
+import json
+import logging
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None  # the memory of a worker is read from /proc (Linux only)
+
+"""
+    This file is called from the file _functions.unlock_file.py. It supervises the worker processes of the unlock
+    step, so one malformed pdf file that makes qpdf spin or use up the memory does not stall the whole run: every
+    worker writes the file it is working on to a small status file, and a thread in the main process kills a worker
+    that works on one file for too long or uses too much memory. The pool of workers is then replaced and the file
+    is quarantined (not tried again), the other files are retried (see uf.run_jobs).
+"""
+
+
+# Category of the result of a quarantined file (see _functions.classify_pdf for the other categories)
+QUARANTINED = 'quarantined'
+# Seconds between two checks of the workers
+CHECK_SECONDS = 0.5
+
+# The status folder of this worker process (set by init_worker)
+_status_dir = None
+
+
+def init_worker(status_dir, initializer=None, initargs=()):
+    """
+    Initializer of a supervised worker process: remembers the status folder and runs the initializer of the pool
+    (e.g. the logging of _functions.log_config).
+    """
+
+    global _status_dir
+    _status_dir = status_dir
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def started(file):
+    """
+    Reports in a worker process that it started on a file. Does nothing if the worker is not supervised.
+    """
+
+    if _status_dir is None:
+        return
+    status = os.path.join(_status_dir, str(os.getpid()))
+    with open(status + '.tmp', 'w', encoding='utf-8') as output:
+        json.dump([file, time.time()], output)
+    os.replace(status + '.tmp', status)
+
+
+def finished():
+    """
+    Reports in a worker process that it finished its file.
+    """
+
+    if _status_dir is None:
+        return
+    try:
+        os.remove(os.path.join(_status_dir, str(os.getpid())))
+    except OSError:
+        pass
+
+
+def rss(pid):
+    """
+    Returns the resident memory in bytes of a process, None if it is not known.
+    """
+
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f'/proc/{pid}/statm', 'r') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class Watchdog:
+    """
+    Kills worker processes that work on one file for longer than timeout seconds or use more than max_rss bytes,
+    from a thread in the main process.
+
+    Attributes
+    ----------
+    status_dir: str
+        The folder the workers write their status files in (see init_worker)
+    quarantined: dict
+        The reason (e.g. 'timeout after 300 s') of every file whose worker was killed
+    kills: int
+        The number of workers killed
+    """
+
+    def __init__(self, timeout=None, max_rss=None):
+        """
+        Parameters
+        ----------
+        timeout: float
+            The maximum seconds for one file, None is no limit
+        max_rss: int
+            The maximum resident memory in bytes of a worker, None is no limit
+        """
+
+        self.timeout = timeout
+        self.max_rss = max_rss
+        self.status_dir = tempfile.mkdtemp(prefix='pdf_unlock_workers_')
+        self.quarantined = {}
+        self.kills = 0
+        if max_rss and psutil is None and not os.path.exists('/proc/self/statm'):
+            logging.warning('Memory of the worker processes cannot be read, install psutil to limit it')
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stop_event.wait(CHECK_SECONDS):
+            try:
+                self.check()
+            except Exception:
+                logging.exception('Failed to check the worker processes')
+
+    def check(self):
+        """
+        Checks the status file of every worker and kills the workers over the limits.
+        """
+
+        now = time.time()
+        for name in os.listdir(self.status_dir):
+            if not name.isdigit():
+                continue
+            try:
+                with open(os.path.join(self.status_dir, name), 'r', encoding='utf-8') as status:
+                    file, start = json.load(status)
+            except (OSError, ValueError):
+                continue  # finished or being written
+            pid = int(name)
+            reason = None
+            if self.timeout and now - start > self.timeout:
+                reason = f'timeout after {self.timeout:g} s'
+            elif self.max_rss:
+                memory = rss(pid)
+                if memory is not None and memory > self.max_rss:
+                    reason = f'memory above {self.max_rss // (1024 * 1024)} MB ({memory // (1024 * 1024)} MB)'
+            if reason is not None:
+                self.kill(pid, file, reason)
+
+    def kill(self, pid, file, reason):
+        logging.error(f'Quarantined PDF file, killing its worker process ({reason}): {file}')
+        self.quarantined[file] = reason
+        self.kills += 1
+        try:
+            os.kill(pid, getattr(signal, 'SIGKILL', signal.SIGTERM))
+        except OSError:
+            pass
+        self.forget(pid)
+
+    def forget(self, pid):
+        try:
+            os.remove(os.path.join(self.status_dir, str(pid)))
+        except OSError:
+            pass
+
+    def reset(self):
+        """
+        Forgets the status of all workers, e.g. when the pool is replaced after a worker was killed.
+        """
+
+        for name in os.listdir(self.status_dir):
+            if name.isdigit():
+                self.forget(name)
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        shutil.rmtree(self.status_dir, ignore_errors=True)
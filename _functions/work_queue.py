@@ -0,0 +1,389 @@
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import _functions.metrics as mt
+import _functions.unlock_file as uf
+
+"""
+    This file is called from the file _functions.pipeline.py and the command line entry point PDF_unlock_cli.py.
+    It spreads the unlocking of one folder over several machines through a work queue: a SQLite file on the share
+    with the pdf files to unlock in batches. A coordinator publishes the batches (see pipeline.publish_tree), any
+    number of workers on any number of hosts claim a batch, unlock it and mark it done. A claimed batch has a lease
+    that the worker renews while it is busy (heartbeat); when a worker dies its lease expires and another worker
+    claims the batch again, so no work is lost.
+
+    Paths are saved relative to the folder of the queue file, so hosts that mount the share in a different place
+    (another drive letter or mount point) find the same files.
+"""
+
+
+# Number of pdf files in a batch
+BATCH_SIZE = 100
+# Seconds a claimed batch stays with a worker without a heartbeat
+LEASE_SECONDS = 300.0
+# Seconds a worker waits before looking again when all open batches are claimed by other workers
+POLL_SECONDS = 5.0
+# Number of times a batch is claimed before it is given up (e.g. a file that crashes every worker)
+MAX_CLAIMS = 3
+
+# States of a batch and of a file
+OPEN = 'open'
+CLAIMED = 'claimed'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    CREATE TABLE IF NOT EXISTS batches (id INTEGER PRIMARY KEY, state TEXT NOT NULL, owner TEXT,
+                                        lease_until REAL, claims INTEGER NOT NULL DEFAULT 0);
+    CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, batch INTEGER NOT NULL, size INTEGER,
+                                      state TEXT NOT NULL, error TEXT, host TEXT);
+    CREATE INDEX IF NOT EXISTS batches_state ON batches (state, lease_until);
+    CREATE INDEX IF NOT EXISTS files_batch ON files (batch);
+"""
+
+
+def queue_path(out_dir):
+    """
+    Returns the default path of the queue file of an output directory: <out_dir>_queue.sqlite
+    """
+
+    return os.path.join(os.path.dirname(out_dir), os.path.basename(out_dir) + '_queue.sqlite')
+
+
+def default_owner():
+    """
+    Returns the name a worker claims batches with: the host name and process id.
+    """
+
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class WorkQueue:
+    """
+    A work queue of pdf files in a SQLite file. Every method commits its own transaction, claims are made with
+    BEGIN IMMEDIATE so two workers never claim the same batch.
+
+    Attributes
+    ----------
+    path: str
+        The queue file
+    process_dir: str
+        The directory of the folder that is unlocked (on this host)
+    out_dir: str
+        The output directory (on this host)
+    """
+
+    def __init__(self, path, timeout=60.0):
+        """
+        Parameters
+        ----------
+        path: str
+            The queue file, it is made if it does not exist
+        timeout: float
+            The seconds to wait for a lock held by another worker
+        """
+
+        self.path = os.path.abspath(path)
+        self.base_dir = os.path.dirname(self.path)
+        self.connection = sqlite3.connect(self.path, timeout=timeout, isolation_level=None)
+        # a rollback journal (not WAL) so the file also works on network shares
+        self.connection.executescript(SCHEMA)
+        meta = dict(self.connection.execute('SELECT key, value FROM meta'))
+        self.process_dir = self.local(meta['process_dir']) if 'process_dir' in meta else None
+        self.out_dir = self.local(meta['out_dir']) if 'out_dir' in meta else None
+
+    def shared(self, path):
+        """
+        Returns a path as it is saved in the queue: relative to the folder of the queue file if possible.
+        """
+
+        try:
+            return os.path.relpath(path, self.base_dir).replace(os.sep, '/')
+        except ValueError:  # another drive on Windows
+            return path
+
+    def local(self, path):
+        """
+        Returns a path from the queue as a path on this host.
+        """
+
+        return os.path.normpath(os.path.join(self.base_dir, path))
+
+    def publish(self, process_dir, out_dir, files, sizes=None, batch_size=BATCH_SIZE):
+        """
+        Adds pdf files to the queue in batches. Files that are already in the queue are left as they are, so
+        publishing the same folder again only adds the new files.
+
+        Parameters
+        ----------
+        process_dir: str
+            The directory of the folder that is unlocked
+        out_dir: str
+            The output directory
+        files: list
+            The pdf files to unlock
+        sizes: dict
+            The size of every file, the largest files are put in the first batches
+        batch_size: int
+            The number of pdf files in a batch
+
+        Returns
+        -------
+        batches: int
+            The number of batches added
+        """
+
+        sizes = sizes or {}
+        files = sorted(files, key=lambda file: sizes.get(file, 0), reverse=True)
+        self.process_dir, self.out_dir = process_dir, out_dir
+        cursor = self.connection.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                               [('process_dir', self.shared(process_dir)), ('out_dir', self.shared(out_dir))])
+            known = {row[0] for row in cursor.execute('SELECT path FROM files')}
+            new_files = [file for file in files if self.shared(file) not in known]
+            batches = 0
+            for start in range(0, len(new_files), batch_size):
+                cursor.execute('INSERT INTO batches (state) VALUES (?)', (OPEN,))
+                cursor.executemany('INSERT INTO files (path, batch, size, state) VALUES (?, ?, ?, ?)',
+                                   [(self.shared(file), cursor.lastrowid, sizes.get(file), OPEN)
+                                    for file in new_files[start:start + batch_size]])
+                batches += 1
+            cursor.execute('COMMIT')
+        except:
+            cursor.execute('ROLLBACK')
+            raise
+        logging.info(f'Published {len(new_files)} pdf files in {batches} batches: {self.path}')
+        return batches
+
+    def claim(self, owner, lease_seconds=LEASE_SECONDS):
+        """
+        Claims an open batch, or a claimed batch whose lease expired. A batch that was claimed MAX_CLAIMS times
+        already is marked failed instead.
+
+        Returns
+        -------
+        batch: int
+            The id of the claimed batch, None if there is no batch to claim
+        files: list
+            The pdf files of the batch that are not done
+        """
+
+        now = time.time()
+        cursor = self.connection.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            while True:
+                row = cursor.execute('SELECT id, claims, owner FROM batches WHERE state = ? OR (state = ? AND '
+                                     'lease_until < ?) ORDER BY id LIMIT 1', (OPEN, CLAIMED, now)).fetchone()
+                if row is None:
+                    cursor.execute('COMMIT')
+                    return None, []
+                batch, claims, previous = row
+                if previous is not None:
+                    logging.warning(f'Lease of batch {batch} expired (claimed by {previous}), claiming it again')
+                if claims >= MAX_CLAIMS:
+                    logging.error(f'Giving up batch {batch} after {claims} claims')
+                    cursor.execute('UPDATE batches SET state = ? WHERE id = ?', (FAILED, batch))
+                    cursor.execute('UPDATE files SET state = ?, error = ? WHERE batch = ? AND state != ?',
+                                   (FAILED, 'worker lost', batch, DONE))
+                    continue
+                cursor.execute('UPDATE batches SET state = ?, owner = ?, lease_until = ?, claims = claims + 1 '
+                               'WHERE id = ?', (CLAIMED, owner, now + lease_seconds, batch))
+                files = [self.local(row[0]) for row in cursor.execute(
+                    'SELECT path FROM files WHERE batch = ? AND state != ?', (batch, DONE))]
+                cursor.execute('COMMIT')
+                return batch, files
+        except:
+            cursor.execute('ROLLBACK')
+            raise
+
+    def heartbeat(self, batch, owner, lease_seconds=LEASE_SECONDS):
+        """
+        Renews the lease of a claimed batch. Returns False if the batch is no longer claimed by owner (the lease
+        expired and another worker claimed it).
+        """
+
+        cursor = self.connection.execute('UPDATE batches SET lease_until = ? WHERE id = ? AND owner = ? AND state = ?',
+                                         (time.time() + lease_seconds, batch, owner, CLAIMED))
+        return cursor.rowcount == 1
+
+    def finish(self, batch, owner, results):
+        """
+        Saves the results of a batch and marks it done, if it is still claimed by owner.
+
+        Parameters
+        ----------
+        batch: int
+            The id of the batch
+        owner: str
+            The worker that claimed the batch
+        results: list
+            The UnlockResult of every file of the batch (see _functions.unlock_file)
+
+        Returns
+        -------
+        finished: bool
+            False if the batch was claimed by another worker in the meantime, its results are then left to them
+        """
+
+        host = socket.gethostname()
+        cursor = self.connection.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            if cursor.execute('SELECT 1 FROM batches WHERE id = ? AND owner = ? AND state = ?',
+                              (batch, owner, CLAIMED)).fetchone() is None:
+                cursor.execute('COMMIT')
+                return False
+            cursor.executemany('UPDATE files SET state = ?, error = ?, host = ? WHERE path = ?',
+                               [(DONE if result.unlocked else FAILED, result.error, host, self.shared(result.file))
+                                for result in results])
+            cursor.execute('UPDATE batches SET state = ?, lease_until = NULL WHERE id = ?', (DONE, batch))
+            cursor.execute('COMMIT')
+            return True
+        except:
+            cursor.execute('ROLLBACK')
+            raise
+
+    def release(self, batch, owner):
+        """
+        Gives a claimed batch back to the queue (e.g. when a worker is stopped), without counting the claim.
+        """
+
+        self.connection.execute('UPDATE batches SET state = ?, owner = NULL, lease_until = NULL, '
+                                'claims = MAX(claims - 1, 0) WHERE id = ? AND owner = ? AND state = ?',
+                                (OPEN, batch, owner, CLAIMED))
+
+    def status(self):
+        """
+        Returns the number of batches and of files per state, e.g. {'batches': {'done': 3, 'claimed': 1},
+        'files': {'done': 280, 'open': 100, 'failed': 2}}
+        """
+
+        return {'batches': dict(self.connection.execute('SELECT state, COUNT(*) FROM batches GROUP BY state')),
+                'files': dict(self.connection.execute('SELECT state, COUNT(*) FROM files GROUP BY state'))}
+
+    def failed(self):
+        """
+        Returns the pdf files that could not be unlocked and why.
+        """
+
+        return [(self.local(path), error) for path, error in
+                self.connection.execute('SELECT path, error FROM files WHERE state = ? ORDER BY path', (FAILED,))]
+
+    def close(self):
+        self.connection.close()
+
+
+def heartbeat(path, batch, owner, lease_seconds, stop):
+    """
+    Renews the lease of a batch every third of lease_seconds until stop is set. Runs in a thread with its own
+    connection to the queue.
+    """
+
+    work_queue = WorkQueue(path)
+    try:
+        while not stop.wait(lease_seconds / 3):
+            try:
+                if not work_queue.heartbeat(batch, owner, lease_seconds):
+                    logging.warning(f'Lost the lease of batch {batch}')
+                    return
+            except sqlite3.Error:
+                logging.warning(f'Failed to renew the lease of batch {batch}')
+    finally:
+        work_queue.close()
+
+
+def work(path, workers=None, owner=None, lease_seconds=LEASE_SECONDS, poll_seconds=POLL_SECONDS, stop=None,
+         on_metrics=None, pool=None, **options):
+    """
+    Runs a worker on a work queue: claims batches and unlocks them with the existing unlock step until every
+    batch is done or failed (or stop is set). While the other workers still have batches claimed, it waits, so it
+    can take over a batch whose lease expired.
+
+    Parameters
+    ----------
+    path: str
+        The queue file (see pipeline.publish_tree)
+    workers: int
+        The number of worker processes on this host, default is the number of cpu's
+    owner: str
+        The name of this worker in the queue, default is the host name and process id
+    lease_seconds: float
+        The seconds a claimed batch stays with this worker without a heartbeat
+    poll_seconds: float
+        The seconds to wait when all open batches are claimed by other workers
+    stop: threading.Event
+        When set, the batch that is being unlocked is finished and the worker stops
+    on_metrics: callable
+        Called with a metrics record (see _functions.metrics) for every pdf file
+    pool: WorkerPool
+        A pool of worker processes that is kept after this queue (see uf.run_jobs)
+    options:
+        Keyword arguments passed on to uf.run_jobs (e.g. timeout, max_rss) and resave_pdf (e.g. fast_path, profile)
+
+    Returns
+    -------
+    summary: dict
+        The queue file, the output directory, the number of batches and pdf files unlocked by this worker, the
+        files that failed in this worker and the state of the whole queue (see WorkQueue.status)
+    """
+
+    owner = owner or default_owner()
+    work_queue = WorkQueue(path)
+    if work_queue.process_dir is None:
+        work_queue.close()
+        raise ValueError(f'Nothing published in queue: {path}')
+    logging.info(f'Worker {owner} on queue: {work_queue.path}')
+    stop = stop if stop is not None else threading.Event()
+    summary = {'queue': work_queue.path, 'out_dir': work_queue.out_dir, 'batches': 0, 'pdf_files': 0,
+               'unlocked_pdfs': 0, 'failed': []}
+    own_pool = pool is None
+    pool = pool or uf.WorkerPool(workers, timeout=options.pop('timeout', None), max_rss=options.pop('max_rss', None))
+    try:
+        while not stop.is_set():
+            batch, files = work_queue.claim(owner, lease_seconds)
+            if batch is None:
+                if not work_queue.status()['batches'].get(CLAIMED):
+                    break
+                stop.wait(poll_seconds)
+                continue
+            logging.info(f'Claimed batch {batch} with {len(files)} pdf files')
+            beating = threading.Event()
+            beat = threading.Thread(target=heartbeat, args=(work_queue.path, batch, owner, lease_seconds, beating),
+                                    daemon=True)
+            beat.start()
+            try:
+                results = []
+                for result in uf.iter_unlock(files, work_queue.process_dir, work_queue.out_dir, pool=pool,
+                                             **options):
+                    if on_metrics is not None:
+                        on_metrics(mt.unlock_record(result))
+                    results.append(result)
+            except:
+                work_queue.release(batch, owner)
+                raise
+            finally:
+                beating.set()
+                beat.join()
+            if not work_queue.finish(batch, owner, results):
+                logging.warning(f'Batch {batch} was claimed by another worker, results not saved')
+                continue
+            summary['batches'] += 1
+            summary['pdf_files'] += len(results)
+            summary['unlocked_pdfs'] += sum(1 for result in results if result.unlocked)
+            summary['failed'].extend(result.file for result in results if not result.unlocked)
+            logging.info(f'Finished batch {batch}')
+        summary['status'] = work_queue.status()
+    finally:
+        if own_pool:
+            pool.shutdown()
+        work_queue.close()
+    logging.info(f'Worker {owner} unlocked {summary["unlocked_pdfs"]} of {summary["pdf_files"]} pdf files in '
+                 f'{summary["batches"]} batches')
+    return summary
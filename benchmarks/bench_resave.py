@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pikepdf
+import _functions.unlock_file as uf
+
+"""
+    Benchmark of the resave step: the old way (copy every pdf to the temp directory, then open the copy) against
+    opening the source directly. The corpus is made by copying the pdf files of a folder (default 'test files')
+    a number of times.
+
+        python benchmarks/bench_resave.py [--src <folder>] [--copies <n>]
+"""
+
+
+def make_corpus(src, copies, corpus_dir):
+    """
+    Copies the pdf files in src copies times into corpus_dir and returns the paths and total size.
+    """
+
+    files = []
+    for name in sorted(os.listdir(src)):
+        if name.lower().endswith('.pdf'):
+            for i in range(copies):
+                file = os.path.join(corpus_dir, f'{i}_{name}')
+                shutil.copyfile(os.path.join(src, name), file)
+                files.append(file)
+    return files, sum(os.path.getsize(file) for file in files)
+
+
+def resave_via_temp(file, file_out):
+    """
+    The previous implementation: copy to a temp directory, open the copy and save.
+    """
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        pdf_file = shutil.copy(file, temp_dir)
+        with pikepdf.open(pdf_file) as pdf:
+            if 'Metadata' in pdf.Root.keys():
+                del pdf.Root.Metadata
+            pdf.save(file_out)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the resave step.')
+    parser.add_argument('--src', default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                      'test files'))
+    parser.add_argument('--copies', type=int, default=50)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        corpus_dir = os.path.join(work_dir, 'corpus')
+        os.mkdir(corpus_dir)
+        files, corpus_bytes = make_corpus(args.src, args.copies, corpus_dir)
+
+        out_dir = os.path.join(work_dir, 'out_temp')
+        os.mkdir(out_dir)
+        start = time.perf_counter()
+        for file in files:
+            resave_via_temp(file, file.replace(corpus_dir, out_dir))
+        via_temp = time.perf_counter() - start
+
+        out_dir = os.path.join(work_dir, 'out_direct')
+        start = time.perf_counter()
+        for file in files:
+            uf.unlock_file(file, corpus_dir, out_dir)
+        direct = time.perf_counter() - start
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f'files: {len(files)}, corpus: {corpus_bytes / 1e6:.1f} MB')
+    print(f'copy to temp + resave: {via_temp:.2f} s ({2 * corpus_bytes / 1e6:.1f} MB extra read/write)')
+    print(f'direct resave:         {direct:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import corpus as cg
+import _functions.unlock_file as uf
+
+"""
+    Benchmark of the scheduling of the unlock step on a skewed corpus: many small pdf files and a few heavy ones
+    that come last in the folder. Compares the wall time of unlocking in folder order with every file sent to the
+    workers on its own, against largest-first with batches of small files.
+
+        python benchmarks/bench_schedule.py [--small <n>] [--large <n>] [--large-pages <n>] [--workers <n>]
+"""
+
+
+def make_skewed_corpus(corpus_dir, small, large, large_pages, seed=0):
+    """
+    Makes small one page pdf files in corpus_dir/a_small and large pdf files with metadata (so they are resaved,
+    not copied) in corpus_dir/z_large. Returns the paths in folder order.
+    """
+
+    rng = random.Random(seed)
+    for number in range(small):
+        cg.save_pdf(cg.make_pdf(rng), os.path.join(corpus_dir, 'a_small', f'small_{number:05d}.pdf'))
+    for number in range(large):
+        cg.save_pdf(cg.make_pdf(rng, pages=large_pages, metadata=True),
+                    os.path.join(corpus_dir, 'z_large', f'large_{number:02d}.pdf'))
+    return sorted(os.path.join(root, name) for root, dirs, files in os.walk(corpus_dir) for name in files)
+
+
+def time_unlock(files, corpus_dir, out_dir, workers, **options):
+    start = time.perf_counter()
+    results = list(uf.iter_unlock(files, corpus_dir, out_dir, workers=workers, **options))
+    seconds = time.perf_counter() - start
+    assert all(result.unlocked for result in results)
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the scheduling of the unlock step.')
+    parser.add_argument('--small', type=int, default=2000)
+    parser.add_argument('--large', type=int, default=4)
+    parser.add_argument('--large-pages', type=int, default=20000)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        corpus_dir = os.path.join(work_dir, 'corpus')
+        files = make_skewed_corpus(corpus_dir, args.small, args.large, args.large_pages)
+        corpus_bytes = sum(os.path.getsize(file) for file in files)
+
+        folder_order = time_unlock(files, corpus_dir, os.path.join(work_dir, 'out_folder_order'), args.workers,
+                                   largest_first=False, batch_bytes=0)
+        largest_first = time_unlock(files, corpus_dir, os.path.join(work_dir, 'out_largest_first'), args.workers)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f'files: {len(files)}, corpus: {corpus_bytes / 1e6:.1f} MB, workers: {args.workers or os.cpu_count()}')
+    print(f'folder order, one file per task:  {folder_order:.2f} s')
+    print(f'largest first, small in batches:  {largest_first:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+"""
+    Benchmark of the start up time of the tool, measured with python -X importtime in a new interpreter for every
+    run. Fails (exit code 1) if an entry point imports tkinter or pikepdf at start up, if it goes over its budget
+    of import time or imported modules (BUDGETS, the same on every machine), or if the import time is more than
+    --tolerance slower than the baseline saved with --update on the same machine:
+
+        python benchmarks/bench_startup.py --update      # save the baseline
+        python benchmarks/bench_startup.py               # compare with the baseline
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_baseline.json')
+
+# The modules imported at start up: the gui and command line entry points and the modules the worker processes
+# import. None of them may load Tk or pikepdf (pikepdf is loaded by the first resave)
+MODULES = ['PDF_unlock_tool', 'PDF_unlock_cli', '_functions.pipeline', '_functions.unlock_file']
+FORBIDDEN = ['tkinter', '_tkinter', 'pikepdf']
+# The maximum import time in ms and number of imported modules of every module, without a baseline as well. The
+# times leave room for a slow machine, the module counts (about 90, 165, 160 and 135 on Python 3.11) do not
+BUDGETS = {'PDF_unlock_tool': (150, 110),
+           'PDF_unlock_cli': (300, 200),
+           '_functions.pipeline': (250, 195),
+           '_functions.unlock_file': (200, 165)}
+
+
+def import_time(module):
+    """
+    Imports a module in a new interpreter and returns the cumulative import time in ms and the imported modules.
+    """
+
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+    seconds = None
+    imported = set()
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imported.add(name.strip())
+        if name.strip() == module:
+            seconds = int(cumulative_us) / 1000
+    return seconds, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the start up time of the tool.')
+    parser.add_argument('--runs', type=int, default=7, help='runs per module, the fastest run counts')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown compared to the baseline, 0.25 is 25 percent')
+    parser.add_argument('--update', action='store_true', help='save the results as the new baseline')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(BASELINE) and not args.update:
+        with open(BASELINE, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+
+    failed = False
+    results = {}
+    for module in MODULES:
+        times = []
+        for run in range(args.runs):
+            ms, imported = import_time(module)
+            times.append(ms)
+            loaded = sorted(name for name in FORBIDDEN if name in imported)
+            if loaded:
+                print(f'FAIL {module} imports {", ".join(loaded)} at start up')
+                failed = True
+                break
+        results[module] = min(times)
+        line = f'{module:<25} {results[module]:8.1f} ms {len(imported):5d} modules'
+        max_ms, max_modules = BUDGETS[module]
+        line += f'  (budget {max_ms} ms, {max_modules} modules)'
+        over = results[module] > max_ms or len(imported) > max_modules
+        if module in baseline:
+            limit = baseline[module] * (1 + args.tolerance)
+            line += f'  (baseline {baseline[module]:.1f} ms, limit {limit:.1f} ms)'
+            over = over or results[module] > limit
+        if over:
+            line = 'FAIL ' + line
+            failed = True
+        print(line)
+
+    if args.update:
+        with open(BASELINE, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f'Saved baseline: {BASELINE}')
+    elif not baseline:
+        print('No baseline yet, only the budgets are checked (run with --update to save one)')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import argparse
+import os
+import random
+import shutil
+import zipfile
+import pikepdf
+
+"""
+    Generates a reproducible corpus of pdf and zip files to benchmark the tool with:
+    - many small pdf files
+    - a few large pdf files
+    - pdf files encrypted with an owner password (restrictions only)
+    - pdf files with XMP metadata
+    - nested zip files
+    - folders with names so long that check_length has to shorten the paths
+
+        python benchmarks/corpus.py <output folder> [--small <n>] [--large <n>] [--large-mb <mb>] [--seed <n>]
+"""
+
+LONG_NAME_LENGTH = 120
+
+
+def make_pdf(rng, pages=1, image_bytes=0, metadata=False):
+    """
+    Makes a pdf with pikepdf.
+
+    Parameters
+    ----------
+    rng: random.Random
+        The random generator, so the content is reproducible
+    pages: int
+        The number of pages, every page has a short text
+    image_bytes: int
+        The size of a random grey image added to the first page, to make large files
+    metadata: bool
+        Add XMP metadata to the document catalog
+    """
+
+    pdf = pikepdf.new()
+    font = pdf.make_indirect(pikepdf.Dictionary(Type=pikepdf.Name.Font, Subtype=pikepdf.Name.Type1,
+                                                BaseFont=pikepdf.Name.Helvetica))
+    for number in range(pages):
+        pdf.add_blank_page()
+        page = pdf.pages[-1]
+        page.Resources = pikepdf.Dictionary(Font=pikepdf.Dictionary(F1=font))
+        text = ' '.join(str(rng.randint(0, 10 ** 6)) for _ in range(8))
+        page.Contents = pdf.make_stream(f'BT /F1 12 Tf 72 720 Td (Page {number} {text}) Tj ET'.encode())
+    if image_bytes:
+        width = 1024
+        height = max(1, image_bytes // width)
+        image = pdf.make_stream(rng.getrandbits(8 * width * height).to_bytes(width * height, 'little'),
+                                Type=pikepdf.Name.XObject, Subtype=pikepdf.Name.Image, Width=width, Height=height,
+                                ColorSpace=pikepdf.Name.DeviceGray, BitsPerComponent=8)
+        page = pdf.pages[0]
+        page.Resources.XObject = pikepdf.Dictionary(Im1=image)
+        page.Contents = pdf.make_stream(page.Contents.read_bytes() + b' q 612 0 0 792 0 0 cm /Im1 Do Q')
+    if metadata:
+        with pdf.open_metadata(set_pikepdf_as_editor=False) as meta:
+            meta['dc:title'] = f'Document {rng.randint(0, 10 ** 6)}'
+    return pdf
+
+
+def save_pdf(pdf, path, encryption=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pdf.save(path, deterministic_id=encryption is None, encryption=encryption)
+
+
+def zip_folder(folder, zip_path):
+    """
+    Zips a folder (including empty folders) and returns the path of the zip file.
+    """
+
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for root, dirs, files in os.walk(folder):
+            for name in sorted(dirs):
+                path = os.path.join(root, name)
+                if not os.listdir(path):
+                    zip_file.write(path, os.path.relpath(path, folder) + '/')
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                zip_file.write(path, os.path.relpath(path, folder))
+    return zip_path
+
+
+def generate_corpus(out_dir, small=1000, large=3, large_mb=50, encrypted=50, metadata=50, nested_depth=3,
+                    long_paths=20, duplicates=0, seed=0):
+    """
+    Generates the benchmark corpus in out_dir/corpus and a zipped copy in out_dir/corpus.zip.
+
+    Parameters
+    ----------
+    out_dir: str
+        The folder the corpus is written to (it is emptied first)
+    small, large, encrypted, metadata, long_paths: int
+        The number of pdf files of every kind
+    large_mb: int
+        The size of every large pdf file in MB
+    nested_depth: int
+        The depth of the nested zip files, every level holds a few small pdf files
+    duplicates: int
+        The number of extra copies of small pdf files (with other names), to benchmark deduplication
+    seed: int
+        The seed of the random generator
+
+    Returns
+    -------
+    corpus: dict
+        The parameters, the paths of the corpus folder and zip file and the number and size of the pdf files
+    """
+
+    rng = random.Random(seed)
+    corpus_dir = os.path.join(out_dir, 'corpus')
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(corpus_dir)
+
+    for number in range(small):
+        save_pdf(make_pdf(rng, pages=rng.randint(1, 3)),
+                 os.path.join(corpus_dir, 'small', f'{number // 100:03d}', f'small_{number:05d}.pdf'))
+    for number in range(large):
+        save_pdf(make_pdf(rng, pages=10, image_bytes=large_mb * 1024 * 1024),
+                 os.path.join(corpus_dir, 'large', f'large_{number:02d}.pdf'))
+    restrictions = pikepdf.Encryption(owner='owner', user='', allow=pikepdf.Permissions(extract=False, modify_other=False))
+    for number in range(encrypted):
+        save_pdf(make_pdf(rng, pages=2), os.path.join(corpus_dir, 'encrypted', f'encrypted_{number:04d}.pdf'),
+                 encryption=restrictions)
+    for number in range(metadata):
+        save_pdf(make_pdf(rng, pages=2, metadata=True),
+                 os.path.join(corpus_dir, 'metadata', f'metadata_{number:04d}.pdf'))
+    long_dir = os.path.join(corpus_dir, 'long', 'd' * LONG_NAME_LENGTH)
+    for number in range(long_paths):
+        save_pdf(make_pdf(rng), os.path.join(long_dir, f'{number:03d}_' + 'n' * LONG_NAME_LENGTH + '.pdf'))
+    small_files = [os.path.join(root, name) for root, dirs, files in os.walk(os.path.join(corpus_dir, 'small'))
+                   for name in files]
+    for number in range(duplicates):
+        duplicate = os.path.join(corpus_dir, 'duplicates', f'copy_{number:04d}.pdf')
+        os.makedirs(os.path.dirname(duplicate), exist_ok=True)
+        shutil.copyfile(rng.choice(sorted(small_files)), duplicate)
+    os.makedirs(os.path.join(corpus_dir, 'empty'))
+
+    # nested zip files: nested.zip contains level_1.zip, which contains level_2.zip, ...
+    if nested_depth:
+        nested_dir = os.path.join(out_dir, 'nested')
+        inner_zip = None
+        for level in range(nested_depth, 0, -1):
+            level_dir = os.path.join(nested_dir, f'level_{level}')
+            for number in range(5):
+                save_pdf(make_pdf(rng), os.path.join(level_dir, f'nested_{level}_{number}.pdf'))
+            if inner_zip:
+                shutil.move(inner_zip, level_dir)
+            inner_zip = zip_folder(level_dir, level_dir + '.zip')
+            shutil.rmtree(level_dir)
+        shutil.move(inner_zip, os.path.join(corpus_dir, 'nested.zip'))
+        shutil.rmtree(nested_dir)
+
+    zip_path = zip_folder(corpus_dir, os.path.join(out_dir, 'corpus.zip'))
+    sizes = [os.path.getsize(os.path.join(root, name)) for root, dirs, files in os.walk(corpus_dir)
+             for name in files if name.endswith('.pdf')]
+    return {'parameters': {'small': small, 'large': large, 'large_mb': large_mb, 'encrypted': encrypted,
+                           'metadata': metadata, 'nested_depth': nested_depth, 'long_paths': long_paths,
+                           'duplicates': duplicates, 'seed': seed},
+            'corpus_dir': corpus_dir,
+            'zip_path': zip_path,
+            'pdf_files': len(sizes) + 5 * nested_depth,
+            'pdf_bytes': sum(sizes)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generates a benchmark corpus of pdf and zip files.')
+    parser.add_argument('out_dir')
+    parser.add_argument('--small', type=int, default=1000)
+    parser.add_argument('--large', type=int, default=3)
+    parser.add_argument('--large-mb', type=int, default=50)
+    parser.add_argument('--encrypted', type=int, default=50)
+    parser.add_argument('--metadata', type=int, default=50)
+    parser.add_argument('--nested-depth', type=int, default=3)
+    parser.add_argument('--long-paths', type=int, default=20)
+    parser.add_argument('--duplicates', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    corpus = generate_corpus(args.out_dir, small=args.small, large=args.large, large_mb=args.large_mb,
+                             encrypted=args.encrypted, metadata=args.metadata, nested_depth=args.nested_depth,
+                             long_paths=args.long_paths, duplicates=args.duplicates, seed=args.seed)
+    print(f'{corpus["pdf_files"]} pdf files ({corpus["pdf_bytes"] / 1e6:.1f} MB) in {corpus["corpus_dir"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pikepdf
+import corpus as cg
+import _functions.pipeline as pl
+import _functions.scan_files as sf
+import _functions.unlock_file as uf
+import _functions.unzip_files as uz
+
+"""
+    Times every stage of the tool (unzip, rename, scan, unlock, count) on a generated corpus (see corpus.py) and
+    writes the results as one json line, so results of different runs and versions can be compared:
+
+        python benchmarks/run_benchmarks.py [--output results.jsonl] [--workers <n>] [corpus options]
+"""
+
+
+def run(work_dir, workers=None, **corpus_options):
+    """
+    Generates the corpus in work_dir and times the stages.
+
+    Returns
+    -------
+    result: dict
+        The environment, corpus parameters and the seconds per stage
+    """
+
+    corpus = cg.generate_corpus(work_dir, **corpus_options)
+    stages = {}
+
+    # unzip: the zipped corpus into a new folder
+    process_dir = os.path.join(work_dir, 'unzipped')
+    start = time.perf_counter()
+    uz.unzip_files(corpus['zip_path'], process_dir)
+    stages['unzip'] = time.perf_counter() - start
+
+    # rename: shorten long names and unzip nested zip files in the folder
+    start = time.perf_counter()
+    pl.prepare_folder(process_dir)
+    stages['rename'] = time.perf_counter() - start
+
+    # scan: find the pdf files
+    start = time.perf_counter()
+    manifest = sf.scan_files(process_dir)
+    files_to_unlock, empty_dir = pl.find_pdf_files(manifest)
+    stages['scan'] = time.perf_counter() - start
+
+    # unlock
+    out_dir = pl.default_out_dir(process_dir)
+    start = time.perf_counter()
+    results = list(uf.iter_unlock(files_to_unlock, process_dir, out_dir, workers=workers))
+    pl.create_empty_dirs(empty_dir, process_dir, out_dir)
+    stages['unlock'] = time.perf_counter() - start
+
+    # count: the unlocked files in the output folder
+    start = time.perf_counter()
+    unlocked_pdfs = len(sf.scan_files(out_dir).pdf_files)
+    stages['count'] = time.perf_counter() - start
+
+    categories = {}
+    for result in results:
+        categories[result.category] = categories.get(result.category, 0) + 1
+    return {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pikepdf': pikepdf.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'workers': workers,
+            'corpus': corpus['parameters'],
+            'pdf_files': len(files_to_unlock),
+            'pdf_bytes': corpus['pdf_bytes'],
+            'unlocked_pdfs': unlocked_pdfs,
+            'failed': sum(1 for result in results if not result.unlocked),
+            'categories': {str(category): number for category, number in categories.items()},
+            'stages': stages,
+            'total': sum(stages.values())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Times the stages of the tool on a generated corpus.')
+    parser.add_argument('--output', default=None, help='json lines file the result is appended to')
+    parser.add_argument('--work-dir', default=None, help='folder for the corpus, default is a temporary folder')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--small', type=int, default=1000)
+    parser.add_argument('--large', type=int, default=3)
+    parser.add_argument('--large-mb', type=int, default=50)
+    parser.add_argument('--encrypted', type=int, default=50)
+    parser.add_argument('--metadata', type=int, default=50)
+    parser.add_argument('--nested-depth', type=int, default=3)
+    parser.add_argument('--long-paths', type=int, default=20)
+    parser.add_argument('--duplicates', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp()
+    try:
+        result = run(work_dir, workers=args.workers, small=args.small, large=args.large, large_mb=args.large_mb,
+                     encrypted=args.encrypted, metadata=args.metadata, nested_depth=args.nested_depth,
+                     long_paths=args.long_paths, duplicates=args.duplicates, seed=args.seed)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    line = json.dumps(result)
+    print(line)
+    if args.output:
+        with open(args.output, 'a', encoding='utf-8') as output:
+            output.write(line + '\n')
+
+
+if __name__ == '__main__':
+    main()
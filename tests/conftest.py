@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pikepdf
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_pdf(path, pages=1, metadata=False):
+    """
+    Saves a small pdf file with pikepdf and returns its path.
+    """
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with pikepdf.new() as pdf:
+        for page in range(pages):
+            pdf.add_blank_page()
+        if metadata:
+            with pdf.open_metadata() as meta:
+                meta['dc:title'] = 'test'
+        pdf.save(path)
+    return path
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """
+    A folder with a few small pdf files in two sub folders, returns the folder and the files.
+    """
+
+    src = tmp_path / 'src'
+    files = [make_pdf(str(src / f'sub{number % 2}' / f'file{number}.pdf'), metadata=number % 2 == 0)
+             for number in range(6)]
+    return str(src), files
@@ -0,0 +1,44 @@
+import os
+import zipfile
+
+import pytest
+
+import _functions.archive_output as ao
+import _functions.pipeline as pl
+
+
+def test_file_not_added_to_archive_fails(corpus, tmp_path, monkeypatch):
+    src, files = corpus
+    archive = str(tmp_path / 'out.zip')
+    move_file = ao.ArchiveWriter.move_file
+
+    def failing_move_file(self, file):
+        if os.path.basename(file) == 'file3.pdf':
+            return False
+        return move_file(self, file)
+
+    monkeypatch.setattr(ao.ArchiveWriter, 'move_file', failing_move_file)
+    summary = pl.unlock_tree(src, workers=1, archive=archive)
+
+    assert summary['unlocked_pdfs'] == len(files) - 1
+    assert [os.path.basename(file) for file in summary['failed']] == ['file3.pdf']
+    with zipfile.ZipFile(archive) as result:
+        assert len([name for name in result.namelist() if name.endswith('.pdf')]) == len(files) - 1
+
+
+def test_error_removes_unfinished_archive(corpus, tmp_path, monkeypatch):
+    src, files = corpus
+    archive = str(tmp_path / 'out.zip')
+    staging = []
+
+    def failing_add_dir(self, arcname):
+        staging.append(self.staging_dir)
+        raise OSError('disk full')
+
+    monkeypatch.setattr(ao.ArchiveWriter, 'add_dir', failing_add_dir)
+    os.makedirs(os.path.join(src, 'empty'))
+    with pytest.raises(OSError):
+        pl.unlock_tree(src, workers=1, archive=archive)
+
+    assert not os.path.exists(archive)
+    assert staging and not os.path.exists(staging[0])
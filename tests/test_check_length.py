@@ -0,0 +1,18 @@
+import os
+
+import _functions.check_length as cl
+
+
+def test_shorten_names_unique(tmp_path):
+    des_dir = str(tmp_path)
+    files = ['x' * 240 + letter + '.pdf' for letter in 'ABCD'] + ['short.pdf']
+    taken = set()
+
+    file_names = cl.shorten_names(des_dir, files, taken=taken)
+
+    names = [os.path.basename(file_name) for file_name, long_name in file_names]
+    assert [long_name for file_name, long_name in file_names] == [True] * 4 + [False]
+    assert len(set(names)) == len(names)
+    assert names[-1] == 'short.pdf'
+    assert all(len(file_name) <= cl.MAX_LENGTH for file_name, long_name in file_names)
+    assert taken == {os.path.normcase(name) for name in names}
@@ -0,0 +1,39 @@
+import glob
+import os
+
+import _functions.checkpoint as ck
+import _functions.pipeline as pl
+
+
+def test_resume_removes_stale_temp_files(corpus, tmp_path):
+    src, files = corpus
+    out_dir = str(tmp_path / 'out')
+    stale = os.path.join(out_dir, 'sub0', 'removed.pdf' + ck.TEMP_SUFFIX)
+    os.makedirs(os.path.dirname(stale))
+    with open(stale, 'wb') as output:
+        output.write(b'%PDF-1.7 partial')
+
+    summary = pl.unlock_tree(src, out_dir, workers=1, resume=True)
+
+    assert summary['unlocked_pdfs'] == len(files)
+    assert glob.glob(os.path.join(out_dir, '**', '*' + ck.TEMP_SUFFIX), recursive=True) == []
+    assert not os.path.exists(ck.journal_path(out_dir))
+
+
+def test_resume_keeps_finished_files_in_cache(corpus, tmp_path):
+    src, files = corpus
+    out_dir = str(tmp_path / 'out')
+    pl.unlock_tree(src, out_dir, workers=1, incremental=True)
+    # the file changed and an interrupted run unlocked it again before the cache was saved
+    os.utime(files[0], (1000000000, 1000000000))
+    journal = ck.open_journal(out_dir)
+    journal.record(ck.UNLOCK, files[0], files[0].replace(src, out_dir))
+    journal.close()
+
+    summary = pl.unlock_tree(src, out_dir, workers=1, incremental=True, prune=True, resume=True)
+
+    assert summary['resumed'] == 1
+    assert summary['pruned'] == []
+    assert os.path.exists(files[0].replace(src, out_dir))
+    summary = pl.unlock_tree(src, out_dir, workers=1, incremental=True)
+    assert summary['cache_hits'] == len(files)
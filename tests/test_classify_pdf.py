@@ -0,0 +1,46 @@
+import os
+
+import pikepdf
+from conftest import make_pdf
+
+import _functions.classify_pdf as cp
+
+
+def test_classify_plain_metadata_encrypted(tmp_path):
+    plain = make_pdf(str(tmp_path / 'plain.pdf'))
+    metadata = make_pdf(str(tmp_path / 'metadata.pdf'), metadata=True)
+    encrypted = str(tmp_path / 'encrypted.pdf')
+    with pikepdf.open(plain) as pdf:
+        pdf.save(encrypted, encryption=pikepdf.Encryption(owner='owner', user='user'))
+
+    assert cp.classify_pdf(plain) == cp.PLAIN
+    assert cp.classify_pdf(metadata) == cp.RESAVED
+    assert cp.classify_pdf(encrypted) == cp.ENCRYPTED
+    with open(plain, 'rb') as file:
+        assert cp.classify_buffer(file.read()) == cp.PLAIN
+
+
+def test_classify_reads_only_catalog(tmp_path):
+    # /Metadata outside the catalog (here in a page) is not deleted by resave_pdf, the file stays plain
+    plain = str(tmp_path / 'plain.pdf')
+    with pikepdf.new() as pdf:
+        pdf.add_blank_page()
+        pdf.pages[0].obj.Metadata = pikepdf.Stream(pdf, b'<x:xmpmeta/>')
+        pdf.save(plain)
+    assert cp.classify_pdf(plain) == cp.PLAIN
+
+
+def test_classify_falls_back_to_resaved(tmp_path):
+    plain = make_pdf(str(tmp_path / 'plain.pdf'))
+    object_streams = str(tmp_path / 'object_streams.pdf')
+    with pikepdf.open(plain) as pdf:
+        pdf.save(object_streams, object_stream_mode=pikepdf.ObjectStreamMode.generate)
+    broken = str(tmp_path / 'broken.pdf')
+    with open(plain, 'rb') as file, open(broken, 'wb') as output:
+        content = file.read()
+        assert b'0000000015 00000 n' in content  # the offset of the catalog
+        output.write(content.replace(b'0000000015 00000 n', b'0000000016 00000 n'))
+
+    assert cp.classify_pdf(object_streams) == cp.RESAVED
+    assert cp.classify_pdf(broken) == cp.RESAVED
+    assert cp.classify_pdf(os.devnull) == cp.RESAVED
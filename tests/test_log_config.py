@@ -0,0 +1,36 @@
+import logging
+import os
+
+import _functions.log_config as lc
+import _functions.unlock_file as uf
+
+
+def log_in_worker(message):
+    logging.info('worker %s', message)
+    try:
+        raise ValueError(message)
+    except ValueError:
+        logging.exception('failed')
+    return os.getpid()
+
+
+def test_supervised_workers_log_through_socket(tmp_path):
+    log_file = str(tmp_path / 'test.log')
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    lc.setup_logging(logging.INFO, filename=log_file)
+    try:
+        initializer, initargs = lc.worker_initializer(supervised=True)
+        assert initializer is lc._use_socket
+        with uf.WorkerPool(1, timeout=60) as pool:
+            pid = pool.get().submit(log_in_worker, 'hello').result()
+        assert pid != os.getpid()
+    finally:
+        lc.stop_logging()
+        root.handlers[:] = handlers
+        root.setLevel(level)
+
+    with open(log_file, 'r', encoding='utf-8') as log:
+        text = log.read()
+    assert 'worker hello' in text
+    assert 'ValueError: hello' in text
@@ -0,0 +1,69 @@
+import os
+import zipfile
+
+import pikepdf
+from conftest import make_pdf
+
+import _functions.checkpoint as ck
+import _functions.pipeline as pl
+import _functions.unlock_file as uf
+import _functions.unzip_files as uz
+
+
+def test_large_members_are_read_when_submitted(corpus, tmp_path, monkeypatch):
+    src, files = corpus
+    zip_dir = str(tmp_path / 'src.zip')
+    with zipfile.ZipFile(zip_dir, 'w') as zip_file:
+        for file in files:
+            zip_file.write(file, os.path.relpath(file, src))
+    # every member is a large file and only one large file fits in memory
+    monkeypatch.setattr(uf, 'LARGE_FILE_SIZE', 1)
+    monkeypatch.setattr(uf, 'SMALL_FILE_SIZE', 0)
+    state = {'read': 0, 'done': 0, 'peak': 0}
+    read = uz.ZipMember.read
+
+    def counting_read(member):
+        state['read'] += 1
+        state['peak'] = max(state['peak'], state['read'] - state['done'])
+        return read(member)
+
+    def progress(done, total):
+        state['done'] = done
+
+    monkeypatch.setattr(uz.ZipMember, 'read', counting_read)
+    pdf_files, unlocked_pdfs, failed, categories, sizes, quarantined = pl.unlock_zip(
+        zip_dir, str(tmp_path / 'out'), workers=2, max_bytes=1, progress=progress)
+
+    assert (pdf_files, unlocked_pdfs, failed) == (len(files), len(files), [])
+    assert state['peak'] == 1
+
+
+def test_resume_keeps_shortened_names_unique(tmp_path):
+    zip_dir = str(tmp_path / 'src.zip')
+    names = ['x' * 240 + 'A.pdf', 'x' * 240 + 'B.pdf']
+    with zipfile.ZipFile(zip_dir, 'w') as zip_file:
+        for pages, name in enumerate(names, 1):
+            zip_file.write(make_pdf(str(tmp_path / f'{pages}.pdf'), pages=pages), name)
+    out_dir = str(tmp_path / 'out')
+    pl.unlock_tree(zip_dir, out_dir, workers=1, stream=True)
+    outputs = sorted(os.listdir(out_dir))
+    assert len(outputs) == 2
+    pages = {}
+    for output in outputs:
+        with pikepdf.open(os.path.join(out_dir, output)) as pdf:
+            pages[len(pdf.pages)] = os.path.join(out_dir, output)
+    # the run was stopped after the first member
+    first = pages[1]
+    os.remove(pages[2])
+    journal = ck.open_journal(out_dir)
+    journal.record(ck.UNLOCK, os.path.join(zip_dir, names[0]), first)
+    journal.close()
+
+    summary = pl.unlock_tree(zip_dir, out_dir, workers=1, stream=True, resume=True)
+
+    assert summary['unlocked_pdfs'] == 2
+    assert sorted(os.listdir(out_dir)) == outputs
+    with pikepdf.open(first) as pdf:
+        assert len(pdf.pages) == 1
+    with pikepdf.open(pages[2]) as pdf:
+        assert len(pdf.pages) == 2
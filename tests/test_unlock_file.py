@@ -0,0 +1,35 @@
+import multiprocessing
+import os
+
+import pytest
+
+import _functions.unlock_file as uf
+
+
+def crashing_resave(source, file, file_out, **options):
+    # dies like a worker that crashes inside qpdf
+    if 'crash' in os.path.basename(file):
+        os._exit(1)
+    return resave_pdf(source, file, file_out, **options)
+
+
+resave_pdf = uf.resave_pdf
+
+
+# The worker processes must inherit the patched resave_pdf
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason='needs fork')
+@pytest.mark.parametrize('batch_bytes', [uf.BATCH_BYTES, 0])
+def test_crash_only_fails_its_own_file(corpus, tmp_path, monkeypatch, batch_bytes):
+    src, files = corpus
+    crash = os.path.join(src, 'sub0', 'crash.pdf')
+    os.link(files[0], crash)
+    monkeypatch.setattr(uf, 'resave_pdf', crashing_resave)
+    out_dir = str(tmp_path / 'out')
+
+    results = list(uf.iter_unlock(files + [crash], src, out_dir, workers=4, batch_bytes=batch_bytes))
+
+    by_file = {result.file: result for result in results}
+    assert sorted(by_file) == sorted(files + [crash])
+    assert not by_file[crash].unlocked
+    assert 'BrokenProcessPool' in by_file[crash].error
+    assert all(by_file[file].unlocked for file in files)
@@ -0,0 +1,34 @@
+import os
+import shutil
+import signal
+
+import _functions.unlock_file as uf
+import _functions.watch_folder as wf
+
+
+def test_loose_pdf_files_use_options(corpus, tmp_path):
+    src, files = corpus
+    inbox = str(tmp_path / 'inbox')
+    os.makedirs(inbox)
+    for file in files[:3]:
+        shutil.copy(file, inbox)
+    shutil.copy(files[0], os.path.join(inbox, 'copy.pdf'))
+    processed_dir, out_dir = str(tmp_path / 'processed'), str(tmp_path / 'out')
+    records, summaries = [], []
+
+    with uf.WorkerPool(1) as pool:
+        wf.unlock_batch(sorted(os.path.join(inbox, name) for name in os.listdir(inbox)), processed_dir, out_dir,
+                        pool, on_summary=summaries.append, dedup=True, on_metrics=records.append, max_bytes=1)
+
+    summary, = summaries
+    assert summary['unlocked_pdfs'] == summary['pdf_files'] == 4
+    assert summary['duplicates'] == 1
+    assert len([record for record in records if record['type'] == 'file']) == 3
+    assert [record['stage'] for record in records if record['type'] == 'stage'] == ['unlock']
+    assert sorted(os.listdir(out_dir)) == ['copy.pdf', 'file0.pdf', 'file1.pdf', 'file2.pdf']
+
+
+def test_workers_ignore_interrupt():
+    with uf.WorkerPool(1) as pool:
+        handler = pool.get().submit(signal.getsignal, signal.SIGINT).result()
+    assert handler == signal.SIG_IGN
@@ -0,0 +1,49 @@
+import glob
+import multiprocessing
+import os
+import time
+
+import pytest
+
+import _functions.checkpoint as ck
+import _functions.unlock_file as uf
+import _functions.watchdog as wd
+
+# The worker processes must inherit the patched resave_pdf
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason='needs fork')
+
+
+def hanging_resave(source, file, file_out, **options):
+    # writes part of the output and hangs, like qpdf spinning on a malformed file
+    os.makedirs(os.path.dirname(file_out), exist_ok=True)
+    with open(ck.temp_path(file_out), 'wb') as output:
+        output.write(b'%PDF-1.7 partial')
+    if 'hang' in os.path.basename(file):
+        time.sleep(60)
+    return resave_pdf(source, file, file_out, **options)
+
+
+resave_pdf = uf.resave_pdf
+
+
+def test_timeout_quarantines_file_without_temp_files(corpus, tmp_path, monkeypatch):
+    src, files = corpus
+    hanging = [os.path.join(src, 'hang0.pdf'), os.path.join(src, 'hang1.pdf')]
+    for file in hanging:
+        os.link(files[0], file)
+    monkeypatch.setattr(uf, 'resave_pdf', hanging_resave)
+    monkeypatch.setattr(wd, 'CHECK_SECONDS', 0.05)
+    out_dir = str(tmp_path / 'out')
+
+    start = time.perf_counter()
+    results = list(uf.iter_unlock(files + hanging, src, out_dir, workers=2, timeout=0.5, batch_bytes=0))
+    assert time.perf_counter() - start < 30
+
+    by_file = {result.file: result for result in results}
+    assert sorted(by_file) == sorted(files + hanging)
+    for file in hanging:
+        assert not by_file[file].unlocked
+        assert by_file[file].category == wd.QUARANTINED
+        assert by_file[file].error.startswith('timeout')
+    assert all(by_file[file].unlocked for file in files)
+    assert glob.glob(os.path.join(out_dir, '**', '*' + ck.TEMP_SUFFIX), recursive=True) == []
@@ -0,0 +1,64 @@
+import multiprocessing
+import os
+import sqlite3
+
+import _functions.pipeline as pl
+import _functions.work_queue as wq
+
+
+def run_worker(path, owner, summaries):
+    summary = wq.work(path, workers=1, owner=owner, poll_seconds=0.1)
+    summaries.put((owner, summary['pdf_files'], summary['unlocked_pdfs']))
+
+
+def batch_rows(path):
+    with sqlite3.connect(path) as connection:
+        return connection.execute('SELECT state, owner, claims FROM batches ORDER BY id').fetchall()
+
+
+def test_workers_share_queue(corpus, tmp_path):
+    src, files = corpus
+    out_dir = str(tmp_path / 'out')
+    published = pl.publish_tree(src, out_dir, batch_size=1)
+    assert published['batches'] == len(files)
+
+    summaries = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=run_worker, args=(published['queue'], f'worker{number}', summaries))
+               for number in range(3)]
+    for worker in workers:
+        worker.start()
+    results = [summaries.get(timeout=120) for worker in workers]
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+    # every file is unlocked by exactly one worker
+    assert sum(pdf_files for owner, pdf_files, unlocked in results) == len(files)
+    assert sum(unlocked for owner, pdf_files, unlocked in results) == len(files)
+    work_queue = wq.WorkQueue(published['queue'])
+    try:
+        assert work_queue.status() == {'batches': {wq.DONE: len(files)}, 'files': {wq.DONE: len(files)}}
+    finally:
+        work_queue.close()
+    assert all(claims == 1 for state, owner, claims in batch_rows(published['queue']))
+    for file in files:
+        assert os.path.isfile(file.replace(src, out_dir))
+
+
+def test_expired_lease_is_reclaimed(corpus, tmp_path):
+    src, files = corpus
+    published = pl.publish_tree(src, str(tmp_path / 'out'), batch_size=len(files))
+    work_queue = wq.WorkQueue(published['queue'])
+    try:
+        # a worker that claims the batch and is lost before it finishes
+        batch, claimed = work_queue.claim('lost', lease_seconds=-1)
+        assert sorted(claimed) == sorted(files)
+
+        summary = wq.work(published['queue'], workers=1, owner='second', poll_seconds=0.1)
+
+        assert summary['unlocked_pdfs'] == len(files)
+        assert batch_rows(published['queue']) == [(wq.DONE, 'second', 2)]
+        assert not work_queue.finish(batch, 'lost', [])
+        assert work_queue.status()['files'] == {wq.DONE: len(files)}
+    finally:
+        work_queue.close()